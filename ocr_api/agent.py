@@ -1,52 +1,165 @@
-from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.output_parsers import JsonOutputParser, StrOutputParser
+from contextlib import aclosing, closing
+import asyncio
 import json
-from ocr import extract_text_from_image
+import threading
+from pydantic import ValidationError
+from documents import iter_pages, read_document_bytes
+from ocr_engine import get_ocr_engine
 from prompt_template import SYSTEM_PROMPT
+from llm_backends import get_llm
+from rule_extractor import extract_with_rules, merge_with_llm, unresolved_fields
+from kyc_validation import KYCExtractionError, KYCResponse, SchemaDivergence, StreamingKYCValidator, check_field
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Generations that diverge from the schema are abandoned and retried up to this many times in total
+MAX_LLM_ATTEMPTS = int(os.getenv("KYC_LLM_MAX_ATTEMPTS", "3"))
+
+_schema = None
+_chain = None
+_parser = None
+_chain_lock = threading.Lock()
+
 def load_schema():
     """Load the KYC schema from JSON file"""
-    with open('kyc_schema.json', 'r') as f:
-        return json.load(f)
+    global _schema
+    if _schema is None:
+        with open('kyc_schema.json', 'r') as f:
+            _schema = json.load(f)
+    return _schema
 
-# Initialize the JSON parser with schema
-parser = JsonOutputParser(pydantic_object=load_schema())
+def get_chain():
+    """Build the prompt | llm chain on first use and share it afterwards; it streams raw text"""
+    global _chain, _parser
+    if _chain is None:
+        with _chain_lock:
+            if _chain is None:
+                # Initialize the JSON parser with schema
+                _parser = JsonOutputParser(pydantic_object=load_schema())
 
-# Create the prompt template using external prompt
-prompt = ChatPromptTemplate.from_messages([
-    ("system", SYSTEM_PROMPT),
-    ("human", "Please extract the KYC information from the provided text.")
-])
+                # Create the prompt template using external prompt
+                prompt = ChatPromptTemplate.from_messages([
+                    ("system", SYSTEM_PROMPT),
+                    ("human", "Please extract the KYC information from the provided text.")
+                ])
 
-llm = ChatGroq(
-    model_name="llama-3.3-70b-versatile",
-    temperature=0.7,
-    api_key=os.getenv("GROQ_API_KEY")
-)
+                # Groq by default; LLM_BACKEND=fake swaps in a deterministic offline model.
+                # Output is parsed here rather than in the chain so it can be validated as it streams.
+                _chain = prompt | get_llm() | StrOutputParser()
+    return _chain
 
-chain = prompt | llm | parser
-
-def parse_kyc_documents(uploaded_files: dict) -> dict:
-    """Process multiple documents and combine their information"""
+def combine_document_texts(texts: dict) -> str:
+    """Concatenate OCR text per document type into the single text block the prompt expects"""
     combined_text = ""
-    
-    for doc_type, file in uploaded_files.items():
-        extracted_text = extract_text_from_image(file)
+    for doc_type, extracted_text in texts.items():
         combined_text += f"\n=== {doc_type.upper()} DOCUMENT ===\n{extracted_text}\n"
-    
+    return combined_text
+
+def _join_pages(page_texts: list) -> str:
+    if len(page_texts) == 1:
+        return page_texts[0]
+    return "\n".join(f"--- PAGE {i} ---\n{text}" for i, text in enumerate(page_texts, start=1))
+
+def _submit_pages(uploaded_files: dict, engine=None) -> dict:
+    """Queue every page of every document on the OCR pool as soon as it is rendered"""
+    engine = engine or get_ocr_engine()
+    return {
+        doc_type: [engine.submit(page, downscale) for page, downscale in iter_pages(read_document_bytes(file))]
+        for doc_type, file in uploaded_files.items()
+    }
+
+def ocr_documents(uploaded_files: dict, engine=None) -> dict:
+    """
+    OCR all pages of all documents in parallel and reassemble the text in input order.
+    Runs on `engine` if given, otherwise on the process-wide OCR engine.
+    """
+    pending = _submit_pages(uploaded_files, engine)
+    return {doc_type: _join_pages([f.result() for f in futures]) for doc_type, futures in pending.items()}
+
+async def aocr_documents(uploaded_files: dict, engine=None) -> dict:
+    """Async variant of ocr_documents; page rendering runs in a thread to keep the loop free"""
+    pending = await asyncio.to_thread(_submit_pages, uploaded_files, engine)
+    texts = {}
+    for doc_type, futures in pending.items():
+        texts[doc_type] = _join_pages(await asyncio.gather(*(asyncio.wrap_future(f) for f in futures)))
+    return texts
+
+def parse_kyc_documents(uploaded_files: dict) -> KYCResponse:
+    """
+    Process multiple documents and combine their information.
+    Raises KYCExtractionError if no schema-valid result could be extracted.
+    """
+    return extract_kyc_fields(combine_document_texts(ocr_documents(uploaded_files)))
+
+def to_kyc_response(result: dict) -> KYCResponse:
+    try:
+        return KYCResponse.model_validate(result)
+    except ValidationError as e:
+        raise KYCExtractionError(f"Extracted fields do not match the KYC schema: {e}") from e
+
+def _parse_output(validator: StreamingKYCValidator, required) -> dict:
+    """
+    Parses a finished generation and checks every field, including any the stream could not see.
+    A missing or null `required` field is divergence too, so it gets the same retry.
+    """
     try:
-        result = chain.invoke({
-            "text": combined_text
-        })
-        return json.dumps(result, indent=2)
+        result = _parser.parse(validator.json_text())
     except Exception as e:
-        print(f"Error processing documents: {str(e)}")
-        return json.dumps({
-            "error": "Failed to process documents",
-            "details": str(e)
-        }, indent=2)
+        raise SchemaDivergence(f"output is not valid JSON: {e}") from e
+    if not isinstance(result, dict):
+        raise SchemaDivergence("output is not a JSON object")
+    missing = [field for field in required if result.get(field) is None]
+    if missing:
+        raise SchemaDivergence(f"output is missing {', '.join(missing)}")
+    for key, value in result.items():
+        check_field(validator.schema, key, value)
+    return result
+
+def _diverged(attempt: int, error: SchemaDivergence):
+    print(f"LLM output diverged from the KYC schema on attempt {attempt}/{MAX_LLM_ATTEMPTS}: {error}")
+
+def llm_extract(combined_text: str, required=None) -> dict:
+    """
+    Stream one LLM extraction, validating each field as it is generated.
+    A generation that diverges from the schema, or leaves out one of the `required` fields
+    (all schema fields by default), is cut off or rejected and retried.
+    """
+    chain = get_chain()
+    required = list(load_schema()["properties"]) if required is None else required
+    for attempt in range(1, MAX_LLM_ATTEMPTS + 1):
+        validator = StreamingKYCValidator(load_schema())
+        try:
+            with closing(chain.stream({"text": combined_text})) as chunks:
+                for chunk in chunks:
+                    validator.feed(chunk)
+            return _parse_output(validator, required)
+        except SchemaDivergence as e:
+            _diverged(attempt, e)
+    raise KYCExtractionError(f"LLM output did not match the KYC schema after {MAX_LLM_ATTEMPTS} attempts")
+
+async def allm_extract(combined_text: str, required=None) -> dict:
+    """Async variant of llm_extract; closing the stream early cancels the rest of the generation"""
+    chain = get_chain()
+    required = list(load_schema()["properties"]) if required is None else required
+    for attempt in range(1, MAX_LLM_ATTEMPTS + 1):
+        validator = StreamingKYCValidator(load_schema())
+        try:
+            async with aclosing(chain.astream({"text": combined_text})) as chunks:
+                async for chunk in chunks:
+                    validator.feed(chunk)
+            return _parse_output(validator, required)
+        except SchemaDivergence as e:
+            _diverged(attempt, e)
+    raise KYCExtractionError(f"LLM output did not match the KYC schema after {MAX_LLM_ATTEMPTS} attempts")
+
+def extract_kyc_fields(combined_text: str) -> KYCResponse:
+    """Rule-based extraction first; the LLM is only called when some field is not confidently resolved"""
+    values, confidences = extract_with_rules(combined_text)
+    unresolved = unresolved_fields(confidences)
+    if not unresolved:
+        return to_kyc_response(values)
+    return to_kyc_response(merge_with_llm(values, confidences, llm_extract(combined_text, unresolved)))
@@ -0,0 +1,260 @@
+import asyncio
+import json
+import os
+import time
+import uuid
+
+from lab import list_s3_user_ids
+
+# Job state is checkpointed after this many completed documents
+CHECKPOINT_EVERY = int(os.getenv("KYC_JOB_CHECKPOINT_EVERY", "50"))
+DEFAULT_CONCURRENCY = int(os.getenv("KYC_JOB_CONCURRENCY", "8"))
+# Upper bound on a job's requested concurrency; each unit is one worker coroutine
+MAX_CONCURRENCY = int(os.getenv("KYC_JOB_MAX_CONCURRENCY", "32"))
+
+ACTIVE_STATUSES = ("queued", "listing", "running")
+
+
+class BatchJobManager:
+    """
+    Runs batch KYC re-verification jobs on the service's event loop.
+
+    Each job lives in `jobs_dir` as three files:
+    - `<jobId>.users.json`: the user ids, written once they are known (after listing for S3 prefixes)
+    - `<jobId>.json`: the job state (status, counters), checkpointed periodically
+    - `<jobId>.results.ndjson`: one line per processed user, appended as soon as it completes
+
+    File I/O while a job runs happens in worker threads, so large jobs do not stall request handling.
+
+    On startup, unfinished jobs are resumed: users that already have a line in the results
+    file are skipped, so a restart only re-does the work that was in flight.
+    """
+
+    def __init__(self, pipeline, jobs_dir="kyc_jobs"):
+        self.pipeline = pipeline
+        self.jobs_dir = jobs_dir
+        self.jobs = {}
+        self._tasks = {}
+        # jobId -> (wall clock start of the current run, activeSeconds before it)
+        self._runs = {}
+        os.makedirs(jobs_dir, exist_ok=True)
+
+    @classmethod
+    def from_env(cls, pipeline):
+        return cls(pipeline, jobs_dir=os.getenv("KYC_JOBS_DIR", "kyc_jobs"))
+
+    # --- Persistence ---
+    def _state_path(self, job_id):
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _results_path(self, job_id):
+        return os.path.join(self.jobs_dir, f"{job_id}.results.ndjson")
+
+    def _users_path(self, job_id):
+        return os.path.join(self.jobs_dir, f"{job_id}.users.json")
+
+    @staticmethod
+    def _write_json(path, data):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def _state(self, job):
+        """A snapshot of the job without its user list, which is stored once in its own file"""
+        return {key: value for key, value in job.items() if key != "userIds"}
+
+    def _checkpoint(self, job):
+        self._write_json(self._state_path(job["jobId"]), self._state(job))
+
+    async def _acheckpoint(self, job):
+        # Snapshot on the event loop so workers cannot change the job mid-write
+        await asyncio.to_thread(self._write_json, self._state_path(job["jobId"]), self._state(job))
+
+    def _completed_user_ids(self, job_id):
+        """Users with a line in the results file, and how many of those lines are failures"""
+        done, failed = set(), 0
+        try:
+            with open(self._results_path(job_id), "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # A torn last line from a crash mid-write; that user is simply redone
+                        continue
+                    done.add(record["userId"])
+                    failed += "error" in record
+        except FileNotFoundError:
+            pass
+        return done, failed
+
+    # --- Job lifecycle ---
+    def submit(self, user_ids=None, s3_prefix=None, concurrency=None) -> dict:
+        job = {
+            "jobId": uuid.uuid4().hex,
+            "status": "queued",
+            "userIds": list(dict.fromkeys(user_ids or [])),
+            "s3Prefix": s3_prefix,
+            "concurrency": min(max(1, concurrency or DEFAULT_CONCURRENCY), MAX_CONCURRENCY),
+            "processed": 0,
+            "failed": 0,
+            "createdAt": time.time(),
+            "startedAt": None,
+            "finishedAt": None,
+            "activeSeconds": 0.0,
+        }
+        self.jobs[job["jobId"]] = job
+        self._write_json(self._users_path(job["jobId"]), job["userIds"])
+        self._checkpoint(job)
+        self._start(job)
+        return job
+
+    def resume_all(self):
+        """Reloads every job from disk and restarts the ones that had not finished"""
+        for name in os.listdir(self.jobs_dir):
+            if not name.endswith(".json") or name.endswith(".users.json"):
+                continue
+            with open(os.path.join(self.jobs_dir, name), "r", encoding="utf-8") as f:
+                job = json.load(f)
+            if "userIds" not in job:
+                # State files written before the user list moved to its own file still carry it
+                try:
+                    with open(self._users_path(job["jobId"]), "r", encoding="utf-8") as f:
+                        job["userIds"] = json.load(f)
+                except FileNotFoundError:
+                    job["userIds"] = []
+            self.jobs[job["jobId"]] = job
+            if job["status"] in ACTIVE_STATUSES:
+                print(f"Resuming KYC batch job {job['jobId']}")
+                self._start(job)
+
+    def _start(self, job):
+        self._tasks[job["jobId"]] = asyncio.create_task(self._run(job))
+
+    def cancel(self, job_id) -> dict:
+        job = self.jobs[job_id]
+        task = self._tasks.pop(job_id, None)
+        if task:
+            task.cancel()
+        if job["status"] in ACTIVE_STATUSES:
+            job["status"] = "cancelled"
+            job["finishedAt"] = time.time()
+            self._checkpoint(job)
+        return job
+
+    async def shutdown(self):
+        """Stops workers without marking jobs cancelled, so they resume on the next start"""
+        for task in self._tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+        for job in self.jobs.values():
+            if job["status"] in ACTIVE_STATUSES:
+                self._checkpoint(job)
+
+    async def _run(self, job):
+        # A resumed job only counts time spent in this run towards its throughput
+        run_started = time.time()
+        active_before = job["activeSeconds"]
+        self._runs[job["jobId"]] = (run_started, active_before)
+        job["startedAt"] = job["startedAt"] or run_started
+        results_file = None
+
+        try:
+            if job["s3Prefix"] is not None and job["status"] in ("queued", "listing"):
+                job["status"] = "listing"
+                await self._acheckpoint(job)
+                listed = await asyncio.to_thread(lambda: list(list_s3_user_ids(job["s3Prefix"])))
+                job["userIds"] = list(dict.fromkeys(job["userIds"] + listed))
+                await asyncio.to_thread(self._write_json, self._users_path(job["jobId"]), job["userIds"])
+
+            job["status"] = "running"
+            await self._acheckpoint(job)
+
+            done, failed = await asyncio.to_thread(self._completed_user_ids, job["jobId"])
+            # The results file is the source of truth; the last checkpoint may lag behind it
+            job["processed"], job["failed"] = len(done), failed
+            queue = asyncio.Queue()
+            for user_id in job["userIds"]:
+                if user_id not in done:
+                    queue.put_nowait(user_id)
+
+            results_file = open(self._results_path(job["jobId"]), "a", encoding="utf-8")
+            write_lock = asyncio.Lock()
+            since_checkpoint = 0
+
+            def append(line):
+                results_file.write(line)
+                results_file.flush()
+
+            async def worker():
+                nonlocal since_checkpoint
+                while not queue.empty():
+                    user_id = queue.get_nowait()
+                    try:
+                        kyc = await self.pipeline.process(user_id)
+                        record = {"userId": user_id, "result": kyc.model_dump()}
+                    except Exception as e:
+                        record = {"userId": user_id, "error": str(e)}
+                        job["failed"] += 1
+                    job["processed"] += 1
+                    async with write_lock:
+                        await asyncio.to_thread(append, json.dumps(record) + "\n")
+                    since_checkpoint += 1
+                    if since_checkpoint >= CHECKPOINT_EVERY:
+                        since_checkpoint = 0
+                        job["activeSeconds"] = active_before + time.time() - run_started
+                        await self._acheckpoint(job)
+
+            await asyncio.gather(*(worker() for _ in range(job["concurrency"])))
+            job["status"] = "completed"
+            job["finishedAt"] = time.time()
+        except Exception as e:
+            job["status"] = "failed"
+            job["error"] = str(e)
+            job["finishedAt"] = time.time()
+        finally:
+            if results_file:
+                results_file.close()
+            job["activeSeconds"] = active_before + time.time() - run_started
+            self._checkpoint(job)
+            self._tasks.pop(job["jobId"], None)
+            self._runs.pop(job["jobId"], None)
+
+    # --- Reporting ---
+    def status(self, job_id) -> dict:
+        job = self.jobs[job_id]
+        active = job["activeSeconds"]
+        if job_id in self._runs:
+            run_started, active_before = self._runs[job_id]
+            active = active_before + time.time() - run_started
+        total = len(job["userIds"])
+        return {
+            "jobId": job["jobId"],
+            "status": job["status"],
+            "total": total,
+            "processed": job["processed"],
+            "failed": job["failed"],
+            "remaining": max(0, total - job["processed"]),
+            "concurrency": job["concurrency"],
+            "activeSeconds": round(active, 2),
+            "documentsPerSecond": round(job["processed"] / active, 3) if active else None,
+            "error": job.get("error"),
+        }
+
+    def results(self, job_id, offset=0, limit=100) -> list:
+        records = []
+        try:
+            with open(self._results_path(job_id), "r", encoding="utf-8") as f:
+                for index, line in enumerate(f):
+                    if index < offset:
+                        continue
+                    if len(records) >= limit:
+                        break
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        # A torn last line from a crash mid-write, as in _completed_user_ids
+                        continue
+        except FileNotFoundError:
+            pass
+        return records
@@ -0,0 +1,328 @@
+"""
+Benchmark for the KYC OCR and extraction pipeline on synthetic Aadhaar-style cards.
+
+Renders cards with known field values at several resolutions and noise levels, then reports:
+- per-stage latency percentiles: baseline OCR (ocr.extract_text_from_image), engine OCR
+  (agent.ocr_documents) and field extraction (rules + LLM)
+- field-level accuracy against the rendered values, per resolution/noise variant, for the
+  rules alone on baseline OCR text and for the full extraction on engine OCR text
+- end-to-end parse_kyc_documents throughput at each concurrency level
+- peak memory of the benchmark process and of the OCR worker processes
+
+The LLM defaults to the offline fake model (LLM_BACKEND=fake), so accuracy reflects OCR and the
+rule extractor; fields the rules leave to the LLM get synthetic values and count as misses.
+FAKE_LLM_LATENCY and FAKE_LLM_TOKENS_PER_SEC shape its timing.
+
+Usage (from ocr_api/):
+    python bench_kyc.py --documents 5 --widths 800,1600,3200 --noise 0,25,50 --concurrency 1,4,8
+    python bench_kyc.py --output before.json   # keep results to compare against a later run
+"""
+import argparse
+import io
+import json
+import os
+import random
+import re
+import resource
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageChops, ImageDraw, ImageFilter, ImageFont
+
+os.environ.setdefault("LLM_BACKEND", "fake")
+
+from agent import combine_document_texts, extract_kyc_fields, ocr_documents, parse_kyc_documents  # noqa: E402
+from ocr import extract_text_from_image  # noqa: E402
+from ocr_engine import get_ocr_engine  # noqa: E402
+from rule_extractor import FIELDS, extract_with_rules, unresolved_fields, verhoeff_valid  # noqa: E402
+
+FIRST_NAMES = ["Aarav", "Priya", "Rohan", "Ananya", "Vikram", "Sneha", "Arjun", "Kavya", "Rahul", "Meera"]
+LAST_NAMES = ["Sharma", "Patel", "Iyer", "Reddy", "Gupta", "Nair", "Singh", "Das", "Joshi", "Menon"]
+STREETS = ["MG Road", "Park Street", "Nehru Nagar", "Station Road", "Gandhi Marg", "Lake View Colony"]
+CITIES = [("Mumbai", "Maharashtra"), ("Chennai", "Tamil Nadu"), ("Kolkata", "West Bengal"),
+          ("Bengaluru", "Karnataka"), ("Jaipur", "Rajasthan"), ("Lucknow", "Uttar Pradesh")]
+
+# Card layout is defined at this width and scaled to the requested resolution
+BASE_WIDTH, BASE_HEIGHT = 1000, 630
+
+
+# --- Synthetic documents ---
+def aadhaar_number(rng) -> str:
+    """A random 12-digit number with a valid Verhoeff check digit"""
+    body = str(rng.randint(2, 9)) + "".join(str(rng.randint(0, 9)) for _ in range(10))
+    return next(body + d for d in "0123456789" if verhoeff_valid(body + d))
+
+
+def random_fields(rng) -> dict:
+    city, state = rng.choice(CITIES)
+    return {
+        "documentType": "AADHAR",
+        "documentId": aadhaar_number(rng),
+        "fullName": f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+        "dateOfBirth": f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(1950, 2004)}",
+        "gender": rng.choice(["MALE", "FEMALE"]),
+        "address": f"{rng.randint(1, 250)} {rng.choice(STREETS)}, {city}, {state} {rng.randint(110001, 855999)}",
+    }
+
+
+def _font(size):
+    try:
+        return ImageFont.truetype("DejaVuSans.ttf", size)
+    except OSError:
+        return ImageFont.load_default(size=size)
+
+
+def render_card(fields: dict, width: int, noise: float, skew: float) -> bytes:
+    """
+    Draws the card at `width` pixels, adds Gaussian noise with standard deviation `noise`
+    (0-255 grey levels), rotates it by `skew` degrees and returns it as a JPEG, like a phone scan.
+    """
+    scale = width / BASE_WIDTH
+    image = Image.new("L", (width, round(BASE_HEIGHT * scale)), 255)
+    draw = ImageDraw.Draw(image)
+    number = " ".join(fields["documentId"][i:i + 4] for i in range(0, 12, 4))
+    street, locality = fields["address"].split(", ", 1)
+    lines = [
+        ("Government of India", 34),
+        (fields["fullName"], 38),
+        (f"DOB: {fields['dateOfBirth']}", 34),
+        (fields["gender"], 34),
+        (number, 50),
+        (f"Address: {street},", 28),
+        (locality, 28),
+    ]
+    y = 40
+    for text, size in lines:
+        draw.text((round(60 * scale), round(y * scale)), text, fill=0, font=_font(round(size * scale)))
+        y += size + 36
+
+    if noise:
+        image = ImageChops.add(image, Image.effect_noise(image.size, noise), offset=-128)
+    if skew:
+        image = image.rotate(skew, resample=Image.BICUBIC, expand=True, fillcolor=255)
+    if scale < 1:
+        # Low-resolution captures are also soft
+        image = image.filter(ImageFilter.GaussianBlur(0.6))
+
+    buffer = io.BytesIO()
+    image.convert("RGB").save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def build_corpus(documents, widths, noise_levels, seed):
+    rng = random.Random(seed)
+    corpus = []
+    for width in widths:
+        for noise in noise_levels:
+            for _ in range(documents):
+                fields = random_fields(rng)
+                data = render_card(fields, width, noise, skew=rng.uniform(-3, 3))
+                corpus.append({"variant": f"w{width}/n{noise:g}", "fields": fields, "data": data})
+    return corpus
+
+
+# --- Measurement helpers ---
+def _percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _latency_summary(values) -> dict:
+    if not values:
+        return {}
+    return {
+        "p50": round(_percentile(values, 50), 4),
+        "p95": round(_percentile(values, 95), 4),
+        "p99": round(_percentile(values, 99), 4),
+        "mean": round(statistics.mean(values), 4),
+    }
+
+
+def _normalize(value) -> str:
+    return re.sub(r"[^a-z0-9]", "", str(value or "").lower())
+
+
+def field_matches(expected: dict, actual: dict) -> dict:
+    """Per-field exact match, ignoring case, spacing and punctuation"""
+    return {field: _normalize(expected[field]) == _normalize(actual.get(field)) for field in FIELDS}
+
+
+def _peak_rss_mb(pid="self"):
+    """Peak resident set size from /proc (Linux), or None where it is not available"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+# --- Benchmark stages ---
+def run_stages(corpus) -> list:
+    """Runs each document through every stage sequentially so stage latencies are not skewed by queueing"""
+    records = []
+    for doc in corpus:
+        record = {"variant": doc["variant"]}
+
+        start = time.perf_counter()
+        baseline_text = extract_text_from_image(io.BytesIO(doc["data"]))
+        record["baseline_ocr"] = time.perf_counter() - start
+        rule_values, _ = extract_with_rules(baseline_text)
+        record["baseline_rules_match"] = field_matches(doc["fields"], rule_values)
+
+        start = time.perf_counter()
+        texts = ocr_documents({"document": doc["data"]})
+        record["engine_ocr"] = time.perf_counter() - start
+
+        combined_text = combine_document_texts(texts)
+        record["needs_llm"] = bool(unresolved_fields(extract_with_rules(combined_text)[1]))
+        start = time.perf_counter()
+        try:
+            result = extract_kyc_fields(combined_text).model_dump()
+            record["error"] = None
+        except Exception as e:
+            result = {}
+            record["error"] = str(e)
+        record["extraction"] = time.perf_counter() - start
+        record["extraction_match"] = field_matches(doc["fields"], result)
+        records.append(record)
+    return records
+
+
+def summarize_stages(records) -> dict:
+    def accuracy(rows, key):
+        return {field: round(sum(r[key][field] for r in rows) / len(rows), 3) for field in FIELDS}
+
+    variants = {}
+    for variant in dict.fromkeys(r["variant"] for r in records):
+        rows = [r for r in records if r["variant"] == variant]
+        variants[variant] = {
+            "baseline_ocr_p50": round(_percentile([r["baseline_ocr"] for r in rows], 50), 4),
+            "engine_ocr_p50": round(_percentile([r["engine_ocr"] for r in rows], 50), 4),
+            "baseline_rules_accuracy": accuracy(rows, "baseline_rules_match"),
+            "extraction_accuracy": accuracy(rows, "extraction_match"),
+            "llm_calls": sum(r["needs_llm"] for r in rows),
+            "errors": sum(r["error"] is not None for r in rows),
+        }
+    return {
+        "latency": {stage: _latency_summary([r[stage] for r in records])
+                    for stage in ("baseline_ocr", "engine_ocr", "extraction")},
+        "baseline_rules_accuracy": accuracy(records, "baseline_rules_match"),
+        "extraction_accuracy": accuracy(records, "extraction_match"),
+        "variants": variants,
+    }
+
+
+def run_throughput(corpus, concurrency_levels) -> dict:
+    """End-to-end parse_kyc_documents over the whole corpus at each concurrency level"""
+
+    def one(doc):
+        start = time.perf_counter()
+        try:
+            parse_kyc_documents({"document": doc["data"]})
+            ok = True
+        except Exception:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    results = {}
+    for concurrency in concurrency_levels:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            outcomes = list(pool.map(one, corpus))
+        elapsed = time.perf_counter() - started
+        results[concurrency] = {
+            "documents_per_second": round(len(corpus) / elapsed, 3),
+            "seconds": round(elapsed, 3),
+            "failures": sum(not ok for _, ok in outcomes),
+            "latency": _latency_summary([latency for latency, _ in outcomes]),
+        }
+    return results
+
+
+def _seconds(summary: dict, key: str, unit: str = "") -> str:
+    """One latency statistic for the report; an empty summary (no samples) prints as n/a"""
+    return f"{summary[key]:.3f}{unit}" if key in summary else "n/a"
+
+
+def _print_report(report):
+    print(f"\n--- {report['documents']} synthetic documents, {report['ocr_workers']} OCR workers, "
+          f"LLM backend {report['llm_backend']} ---")
+    print("\nStage latency (seconds):")
+    for stage, summary in report["stages"]["latency"].items():
+        print(f"  {stage:<14} p50 {_seconds(summary, 'p50')}  p95 {_seconds(summary, 'p95')}  "
+              f"p99 {_seconds(summary, 'p99')}  mean {_seconds(summary, 'mean')}")
+
+    print("\nField accuracy (baseline OCR + rules / engine OCR + full extraction):")
+    for field in FIELDS:
+        print(f"  {field:<13} {report['stages']['baseline_rules_accuracy'][field]:.0%} / "
+              f"{report['stages']['extraction_accuracy'][field]:.0%}")
+
+    print("\nPer variant:")
+    print(f"  {'variant':<12} {'base ocr':>9} {'eng ocr':>8} {'base acc':>9} {'full acc':>9} {'llm':>4} {'err':>4}")
+    for variant, row in report["stages"]["variants"].items():
+        base = statistics.mean(row["baseline_rules_accuracy"].values())
+        full = statistics.mean(row["extraction_accuracy"].values())
+        print(f"  {variant:<12} {row['baseline_ocr_p50']:>8.3f}s {row['engine_ocr_p50']:>7.3f}s "
+              f"{base:>9.0%} {full:>9.0%} {row['llm_calls']:>4} {row['errors']:>4}")
+
+    print("\nparse_kyc_documents throughput:")
+    for concurrency, row in report["throughput"].items():
+        print(f"  concurrency {concurrency:>3}: {row['documents_per_second']:.2f} docs/s, "
+              f"p50 {_seconds(row['latency'], 'p50', 's')}, p95 {_seconds(row['latency'], 'p95', 's')}, "
+              f"failures {row['failures']}")
+
+    memory = report["memory_mb"]
+    print(f"\nPeak RSS: benchmark process {memory['process']} MB, "
+          f"OCR workers max {memory['ocr_worker_max']} MB (sum {memory['ocr_workers_total']} MB)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=5, help="documents per resolution/noise variant")
+    parser.add_argument("--widths", default="800,1600,3200", help="card widths in pixels")
+    parser.add_argument("--noise", default="0,25,50", help="Gaussian noise standard deviations")
+    parser.add_argument("--concurrency", default="1,4,8", help="concurrency levels for the throughput run")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write the full results as JSON to this path")
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.documents,
+                          [int(w) for w in args.widths.split(",")],
+                          [float(n) for n in args.noise.split(",")],
+                          args.seed)
+    # Start the worker pool up front so its start-up is not billed to the first document
+    engine = get_ocr_engine()
+
+    stages = summarize_stages(run_stages(corpus))
+    throughput = run_throughput(corpus, [int(c) for c in args.concurrency.split(",")])
+
+    worker_peaks = [_peak_rss_mb(pid) for pid in getattr(engine._pool, "_processes", None) or {}]
+    worker_peaks = [peak for peak in worker_peaks if peak is not None]
+    report = {
+        "documents": len(corpus),
+        "ocr_workers": engine.workers,
+        "llm_backend": os.getenv("LLM_BACKEND"),
+        "stages": stages,
+        "throughput": throughput,
+        "ocr_engine": engine.stats(),
+        "memory_mb": {
+            "process": _peak_rss_mb() or round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            "ocr_worker_max": max(worker_peaks, default=None),
+            "ocr_workers_total": round(sum(worker_peaks), 1) if worker_peaks else None,
+        },
+    }
+    _print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    engine.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import io
+import os
+
+from PIL import Image, ImageSequence
+
+# PDF pages are rasterized at this density; Tesseract is tuned for about 300 DPI
+PDF_RENDER_DPI = int(os.getenv("PDF_RENDER_DPI", "300"))
+
+
+def read_document_bytes(document) -> bytes:
+    """Accepts raw bytes, a file-like object or a path and returns the document bytes"""
+    if isinstance(document, (bytes, bytearray)):
+        return bytes(document)
+    if hasattr(document, "read"):
+        if hasattr(document, "seek"):
+            document.seek(0)
+        return document.read()
+    with open(document, "rb") as f:
+        return f.read()
+
+
+def _encode_page(image: Image.Image) -> bytes:
+    # Fast PNG compression; the bytes only travel to a local worker process
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", compress_level=1)
+    return buffer.getvalue()
+
+
+def _iter_pdf_pages(data: bytes):
+    try:
+        import pypdfium2 as pdfium
+    except ImportError:
+        raise ValueError("PDF documents require the pypdfium2 package")
+
+    pdf = pdfium.PdfDocument(data)
+    try:
+        for index in range(len(pdf)):
+            page = pdf[index]
+            try:
+                yield _encode_page(page.render(scale=PDF_RENDER_DPI / 72).to_pil())
+            finally:
+                page.close()
+    finally:
+        pdf.close()
+
+
+def _iter_tiff_pages(data: bytes):
+    with Image.open(io.BytesIO(data)) as tiff:
+        for frame in ImageSequence.Iterator(tiff):
+            yield _encode_page(frame.convert("RGB"))
+
+
+def iter_pages(data: bytes):
+    """
+    Yields (page_bytes, downscale) for every page of a document, one page at a time.
+
+    PDFs are rendered at PDF_RENDER_DPI, which is already OCR resolution, so downscale is False.
+    Multi-page TIFFs are split into frames and any other image is passed through untouched as
+    a single page; both are downscaled as usual.
+    """
+    if data.startswith(b"%PDF"):
+        for page in _iter_pdf_pages(data):
+            yield page, False
+    elif data[:4] in (b"II*\x00", b"MM\x00*"):
+        for page in _iter_tiff_pages(data):
+            yield page, True
+    else:
+        yield data, True
@@ -0,0 +1,42 @@
+import hashlib
+import os
+import sys
+
+# The LRU is shared with portfolio_construction. ocr_api runs from its own directory, so the
+# repository root is made importable here.
+_REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _REPO_ROOT not in sys.path:
+    sys.path.append(_REPO_ROOT)
+
+from portfolio_construction.cache import LRUCache  # noqa: E402
+
+
+def content_key(data: bytes) -> str:
+    """Cache key for a document identified by its bytes"""
+    return "sha256-" + hashlib.sha256(data).hexdigest()
+
+
+def etag_key(bucket: str, key: str, etag: str) -> str:
+    """Cache key for an S3 object version; ETags change whenever the object is overwritten"""
+    digest = hashlib.sha256(f"{bucket}/{key}".encode("utf-8")).hexdigest()[:32]
+    etag = etag.strip('"')
+    return f"etag-{digest}-{etag}"
+
+
+class KYCCache(LRUCache):
+    """
+    Caches OCR text and the validated KYC JSON per document.
+
+    Entries are dicts with an "ocr_text" and, once extraction succeeded, a "kyc" field.
+    They are kept in an in-memory LRU of `max_entries` and, if `disk_dir` is set, also
+    as `<key>.json` files there so they survive restarts and are shared between workers.
+    """
+
+    def __init__(self, max_entries=1024, disk_dir=None):
+        super().__init__(max_entries=max_entries, disk_dir=disk_dir)
+
+    @classmethod
+    def from_env(cls):
+        """Configured via KYC_CACHE_SIZE and KYC_CACHE_DIR"""
+        return cls(max_entries=int(os.getenv("KYC_CACHE_SIZE", "1024")),
+                   disk_dir=os.getenv("KYC_CACHE_DIR") or None)
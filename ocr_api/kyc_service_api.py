@@ -1,21 +1,20 @@
+import asyncio
 from fastapi import FastAPI, HTTPException
-from typing import Dict
-import boto3
+from typing import Dict, List, Optional
 from botocore.exceptions import ClientError
 import os
 from pydantic import BaseModel
 from dotenv import load_dotenv
 import json
-from agent import parse_kyc_documents
 import io
 from pathlib import Path
 from enum import Enum
-from lab import get_s3_file
+from pipeline import KYCPipeline
+from kyc_validation import KYCExtractionError, KYCResponse
+from batch_jobs import BatchJobManager
 
 load_dotenv()
 
-LOCAL_FILE_PATH = "kyc.img"
-
 # Ensure KYC_Images directory exists
 os.makedirs("KYC_Images", exist_ok=True)
 
@@ -27,30 +26,6 @@ S3_CONFIG = {
 app = FastAPI(title="KYC Document Processing API",
              description="API to process KYC documents using OCR and LLM")
 
-s3_client = None
-s3_client = boto3.client(
-        's3',
-        aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
-        aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
-        region_name=os.getenv('AWS_REGION', 'us-east-1')
-    )
-
-class KYCResponse(BaseModel):
-    documentType: str
-    documentId: str
-    fullName: str
-    dateOfBirth: str
-    gender: str
-    address: str
-
-def get_local_file() -> dict:
-    """Get file from specified local path"""
-    try:
-        with open(LOCAL_FILE_PATH, 'rb') as f:
-            return {'document': io.BytesIO(f.read())}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error reading file: {str(e)}")
-
 # def get_s3_file(userId: str):
 #     """Get file from specified S3 path"""
 #     if not s3_client:
@@ -65,33 +40,87 @@ def get_local_file() -> dict:
 #         raise HTTPException(status_code=500, detail=str(e))
     
 
+class BatchJobRequest(BaseModel):
+    userIds: List[str] = []
+    s3Prefix: Optional[str] = None
+    concurrency: Optional[int] = None
+
+pipeline = None
+batch_jobs = None
+
+@app.on_event("startup")
+async def start_pipeline():
+    # Created inside the running loop so its semaphores bind to the server's event loop
+    global pipeline, batch_jobs
+    pipeline = KYCPipeline.from_env()
+    batch_jobs = BatchJobManager.from_env(pipeline)
+    batch_jobs.resume_all()
+
+@app.on_event("shutdown")
+async def stop_pipeline():
+    if batch_jobs:
+        await batch_jobs.shutdown()
+    if pipeline:
+        pipeline.shutdown()
+
 @app.get("/ocr-service/process/{userId}", response_model=KYCResponse)
-async def process_document(userId: str):
+async def process_document(userId: str, refresh: bool = False):
     """
-    Process single KYC document and fill JSON schema using OCR and Groq LLM
+    Process single KYC document and fill JSON schema using OCR and Groq LLM.
+    Unchanged documents are served from the OCR/extraction cache unless `refresh` is set.
     """
     try:
         print("User ID", userId)
-        get_s3_file(userId)
-        print("File downloaded")
-        uploaded_files = get_local_file()
-        
-        if not uploaded_files:
-            raise HTTPException(status_code=404, detail="Could not read document")
-        
-        # Process document using the existing agent
-        result = parse_kyc_documents(uploaded_files)
-        
-        # Parse the JSON string returned by the agent
-        try:
-            json_result = json.loads(result)
-            return json_result
-        except json.JSONDecodeError:
-            raise HTTPException(status_code=500, detail="Error parsing JSON response from agent")
-        
+        # S3, OCR and LLM stages run off the event loop with their own concurrency limits
+        return await pipeline.process(userId, refresh=refresh)
+    except HTTPException:
+        raise
+    except KYCExtractionError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/ocr-service/metrics")
+async def pipeline_metrics():
+    """Per-stage concurrency limits, in-flight counts and latency percentiles"""
+    return pipeline.stats()
+
+@app.post("/ocr-service/batch", status_code=202)
+async def submit_batch_job(request: BatchJobRequest):
+    """
+    Queue re-verification of many users. Pass explicit `userIds`, an `s3Prefix` whose
+    documents are listed page by page, or both; `concurrency` caps documents in flight
+    (clamped to KYC_JOB_MAX_CONCURRENCY).
+    """
+    if not request.userIds and request.s3Prefix is None:
+        raise HTTPException(status_code=422, detail="Provide userIds or s3Prefix")
+    if request.concurrency is not None and request.concurrency < 1:
+        raise HTTPException(status_code=422, detail="concurrency must be at least 1")
+    job = batch_jobs.submit(request.userIds, request.s3Prefix, request.concurrency)
+    return batch_jobs.status(job["jobId"])
+
+@app.get("/ocr-service/batch/{jobId}")
+async def get_batch_job(jobId: str):
+    """Job status with progress counters and throughput"""
+    if jobId not in batch_jobs.jobs:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return batch_jobs.status(jobId)
+
+@app.get("/ocr-service/batch/{jobId}/results")
+async def get_batch_job_results(jobId: str, offset: int = 0, limit: int = 100):
+    """Per-user results in completion order, paged with offset/limit"""
+    if jobId not in batch_jobs.jobs:
+        raise HTTPException(status_code=404, detail="Job not found")
+    results = await asyncio.to_thread(batch_jobs.results, jobId, offset, min(limit, 1000))
+    return {"jobId": jobId, "offset": offset, "results": results}
+
+@app.post("/ocr-service/batch/{jobId}/cancel")
+async def cancel_batch_job(jobId: str):
+    if jobId not in batch_jobs.jobs:
+        raise HTTPException(status_code=404, detail="Job not found")
+    batch_jobs.cancel(jobId)
+    return batch_jobs.status(jobId)
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
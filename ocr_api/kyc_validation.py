@@ -0,0 +1,89 @@
+import json
+import os
+import re
+from typing import Literal
+
+from pydantic import BaseModel, Field
+
+# A generation that has not closed its JSON object after this many characters is abandoned
+MAX_OUTPUT_CHARS = int(os.getenv("KYC_LLM_MAX_OUTPUT_CHARS", "2000"))
+# Text allowed before the JSON object ("Here is the JSON:", a markdown code fence ...)
+MAX_PREAMBLE_CHARS = 200
+
+_PAIR = re.compile(r'"(\w+)"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+
+class KYCResponse(BaseModel):
+    """The KYC fields of kyc_schema.json, with its enums and patterns enforced"""
+    documentType: Literal["AADHAR"]
+    documentId: str = Field(pattern=r"^\d{12}$")
+    fullName: str = Field(min_length=1)
+    dateOfBirth: str = Field(pattern=r"^\d{2}/\d{2}/\d{4}$")
+    gender: Literal["MALE", "FEMALE"]
+    address: str = Field(min_length=1)
+
+
+class SchemaDivergence(ValueError):
+    """The LLM output can no longer become a schema-valid KYC object"""
+
+
+class KYCExtractionError(Exception):
+    """No schema-valid KYC object could be produced for a document"""
+
+
+def check_field(schema: dict, key: str, value) -> None:
+    """Raises SchemaDivergence if one field value breaks the schema's enum or pattern"""
+    spec = schema["properties"].get(key)
+    if spec is None:
+        raise SchemaDivergence(f"unexpected field '{key}'")
+    if not isinstance(value, str):
+        raise SchemaDivergence(f"'{key}' must be a string")
+    if "enum" in spec and value not in spec["enum"]:
+        raise SchemaDivergence(f"'{key}' must be one of {spec['enum']}, got '{value}'")
+    if "pattern" in spec and not re.search(spec["pattern"], value):
+        raise SchemaDivergence(f"'{key}' does not match {spec['pattern']}: '{value}'")
+
+
+class StreamingKYCValidator:
+    """
+    Checks LLM output against the KYC schema while it is still being generated.
+
+    Each completed `"key": "value"` pair is validated as soon as its closing quote arrives,
+    so a wrong enum, a malformed id or date, or an unknown key is detected after a few tokens
+    rather than after the whole completion. A short preamble or code fence before the JSON
+    object is skipped; prose with no object in its first MAX_PREAMBLE_CHARS is divergence.
+    """
+
+    def __init__(self, schema: dict, max_chars: int = MAX_OUTPUT_CHARS):
+        self.schema = schema
+        self.max_chars = max_chars
+        self.buffer = ""
+        self.fields = {}
+        self._scanned = 0
+
+    def _body(self):
+        """The output from the start of its JSON object, or None while still in the preamble"""
+        start = self.buffer.find("{")
+        preamble = len(self.buffer[:start].strip()) if start != -1 else len(self.buffer.strip())
+        if preamble > MAX_PREAMBLE_CHARS:
+            raise SchemaDivergence(f"no JSON object in the first {MAX_PREAMBLE_CHARS} characters of output")
+        return self.buffer[start:] if start != -1 else None
+
+    def json_text(self) -> str:
+        """The JSON object of the finished output, without preamble or closing code fence"""
+        body = self._body() or ""
+        return body.rstrip().removesuffix("```")
+
+    def feed(self, chunk: str) -> None:
+        self.buffer += chunk
+        if len(self.buffer) > self.max_chars:
+            raise SchemaDivergence(f"output exceeded {self.max_chars} characters")
+        body = self._body()
+        if body is None:
+            return
+        for match in _PAIR.finditer(body, self._scanned):
+            key, raw = match.groups()
+            value = json.loads(f'"{raw}"')
+            check_field(self.schema, key, value)
+            self.fields[key] = value
+            self._scanned = match.end()
@@ -1,33 +1,77 @@
 from fastapi import FastAPI, HTTPException
 from typing import Dict
-import boto3
 from botocore.exceptions import ClientError
 import os
 from pydantic import BaseModel
 from dotenv import load_dotenv
-from agent import parse_kyc_documents
 from pathlib import Path
 from enum import Enum
+import shutil
+import tempfile
+from contextlib import closing
+from s3 import TRANSFER_CONFIG, get_s3_client
 
 load_dotenv()
 
-s3_client = None
-s3_client = boto3.client(
-        's3',
-        aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
-        aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
-        region_name=os.getenv('AWS_REGION', 'us-east-1')
-    )
-
-def get_s3_file(userId: str) -> dict:
-    """Get file from specified S3 path"""
-    if not s3_client:
-        raise HTTPException(status_code=500, detail="S3 client not initialized")
-    
+# Documents up to this size stay in memory; larger scans spill to a private temp file
+SPOOL_MAX_BYTES = int(os.getenv("KYC_SPOOL_MAX_BYTES", str(8 * 1024 * 1024)))
+
+S3_BUCKET = "dtcchakathon"
+
+def s3_key(userId: str) -> str:
+    """Object key of a user's KYC document"""
+    return userId+"/kyc.img"
+
+def get_s3_etag(userId: str) -> str:
+    """ETag of a user's KYC document, fetched with a HEAD request (no download)"""
+    s3_client = get_s3_client()
+
+    try:
+        return s3_client.head_object(Bucket=S3_BUCKET, Key=s3_key(userId))["ETag"]
+    except ClientError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def list_s3_user_ids(prefix: str = ""):
+    """
+    Yields the userId of every KYC document under `prefix`, following list_objects_v2
+    pagination so arbitrarily large buckets are listed one page at a time.
+    """
+    s3_client = get_s3_client()
+
     try:
-        s3_client.download_file("dtcchakathon", userId+"/kyc.img", "kyc.img")
-        
+        paginator = s3_client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=S3_BUCKET, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                if obj["Key"].endswith("/kyc.img"):
+                    yield obj["Key"][:-len("/kyc.img")]
     except ClientError as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def get_s3_file(userId: str, etag: str = None):
+    """
+    Get file from specified S3 path.
+    The object is streamed into a request-scoped buffer that the caller owns and should close,
+    so concurrent requests never share a file on disk.
+    With `etag`, the GET is conditional on it, so the bytes are exactly that version of the
+    object; if it has been overwritten since, this raises an HTTPException with status 412.
+    """
+    s3_client = get_s3_client()
+
+    buffer = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    try:
+        if etag:
+            # The managed (multipart) download does not accept IfMatch, so this is a single GET
+            body = s3_client.get_object(Bucket=S3_BUCKET, Key=s3_key(userId), IfMatch=etag)["Body"]
+            with closing(body):
+                shutil.copyfileobj(body, buffer)
+        else:
+            s3_client.download_fileobj(S3_BUCKET, s3_key(userId), buffer, Config=TRANSFER_CONFIG)
+        buffer.seek(0)
+        return buffer
+
+    except ClientError as e:
+        buffer.close()
+        changed = e.response.get("Error", {}).get("Code") in ("PreconditionFailed", "412")
+        raise HTTPException(status_code=412 if changed else 500, detail=str(e))
+
 # print(get_s3_file("919930866565"))
\ No newline at end of file
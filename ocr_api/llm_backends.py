@@ -0,0 +1,81 @@
+import hashlib
+import json
+import os
+import time
+from typing import Any, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class FakeKYCChatModel(BaseChatModel):
+    """
+    Deterministic, offline stand-in for the Groq model used in benchmarks and load tests.
+
+    Returns a schema-valid KYC JSON object derived from a hash of the prompt, so the same
+    OCR text always yields the same answer. `latency` is the time to first token in seconds
+    and `tokens_per_second` paces the rest of the output; set either to 0 to disable waiting.
+    """
+
+    latency: float = 0.5
+    tokens_per_second: float = 50.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-kyc"
+
+    def _answer(self, messages: List[BaseMessage]) -> str:
+        digest = hashlib.sha256("".join(str(m.content) for m in messages).encode("utf-8")).hexdigest()
+        seed = int(digest, 16)
+        return json.dumps({
+            "documentType": "AADHAR",
+            "documentId": str(seed % 10**12).zfill(12),
+            "fullName": "Synthetic User",
+            "dateOfBirth": f"{seed % 28 + 1:02d}/{seed % 12 + 1:02d}/{1950 + seed % 55}",
+            "gender": "MALE" if seed % 2 else "FEMALE",
+            "address": "1 Test Street, Test City, Test State, 400001",
+        })
+
+    def _tokens(self, messages: List[BaseMessage]) -> Iterator[str]:
+        if self.latency:
+            time.sleep(self.latency)
+        answer = self._answer(messages)
+        delay = 1.0 / self.tokens_per_second if self.tokens_per_second else 0
+        # Roughly four characters per token, like the real model's output
+        for i in range(0, len(answer), 4):
+            if delay:
+                time.sleep(delay)
+            yield answer[i:i + 4]
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        content = "".join(self._tokens(messages))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager: Any = None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        for token in self._tokens(messages):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+
+def get_llm():
+    """
+    Builds the chat model selected by LLM_BACKEND: "groq" (default) or "fake".
+    The fake model reads FAKE_LLM_LATENCY and FAKE_LLM_TOKENS_PER_SEC.
+    """
+    backend = os.getenv("LLM_BACKEND", "groq").lower()
+    if backend == "fake":
+        return FakeKYCChatModel(
+            latency=float(os.getenv("FAKE_LLM_LATENCY", "0.5")),
+            tokens_per_second=float(os.getenv("FAKE_LLM_TOKENS_PER_SEC", "50")),
+        )
+    if backend == "groq":
+        from langchain_groq import ChatGroq
+
+        return ChatGroq(
+            model_name="llama-3.3-70b-versatile",
+            temperature=0.7,
+            api_key=os.getenv("GROQ_API_KEY")
+        )
+    raise ValueError(f"Unknown LLM_BACKEND '{backend}'. Expected 'groq' or 'fake'.")
@@ -0,0 +1,352 @@
+import io
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from PIL import Image, ImageOps
+
+# Tesseract is most accurate around 300 DPI; an ID card scanned at that density is roughly
+# 1000-1600 px wide, so anything larger is downscaled before recognition.
+TARGET_MAX_SIDE = int(os.getenv("OCR_TARGET_MAX_SIDE", "1600"))
+# Deskew searches this many degrees either side of horizontal
+DESKEW_MAX_ANGLE = 5.0
+DESKEW_STEP = 0.5
+# Pixels of margin kept around the detected text regions
+CROP_MARGIN = 12
+
+# Text-region detection (recursive XY-cut on ink profiles).
+# A row or column with at most this share of ink counts as empty, so speckle and the side lines
+# of a card frame do not join separate regions.
+EMPTY_LINE_INK = 0.01
+# Rows/columns of empty space that separate blocks: any row gap splits lines, while a column gap
+# must be about half the line height (within MIN/MAX_COLUMN_GAP) so words on a line stay together
+MIN_ROW_GAP = 2
+MIN_COLUMN_GAP = 8
+MAX_COLUMN_GAP = 32
+# Blocks thinner than this (px) and long in the other direction are rules or frame lines
+RULE_THICKNESS = 6
+# A block this many times taller than the median block, and denser than TEXT_MAX_DENSITY,
+# is a photo, QR code or logo rather than text
+MAX_LINE_HEIGHT_RATIO = 4
+TEXT_MAX_DENSITY = 0.3
+# Pixels kept around each text region when masking, for descenders and accents thinner than a row
+REGION_PADDING = 6
+
+TESSERACT_LANG = "eng"
+TESSERACT_PSM = int(os.getenv("OCR_PSM", "3"))
+
+
+# --- Image preprocessing ---
+def _otsu_threshold(gray: Image.Image) -> int:
+    """Global threshold that best separates ink from paper, from the grayscale histogram"""
+    histogram = gray.histogram()
+    total = sum(histogram)
+    sum_all = sum(i * count for i, count in enumerate(histogram))
+    sum_background, weight_background = 0.0, 0
+    best_threshold, best_variance = 127, 0.0
+    for level, count in enumerate(histogram):
+        weight_background += count
+        if weight_background == 0:
+            continue
+        weight_foreground = total - weight_background
+        if weight_foreground == 0:
+            break
+        sum_background += level * count
+        mean_background = sum_background / weight_background
+        mean_foreground = (sum_all - sum_background) / weight_foreground
+        variance = weight_background * weight_foreground * (mean_background - mean_foreground) ** 2
+        if variance > best_variance:
+            best_variance, best_threshold = variance, level
+    return best_threshold
+
+
+def _row_profile_score(binary: Image.Image) -> float:
+    """Variance of ink per row; highest when text lines are horizontal"""
+    width, height = binary.size
+    data = binary.tobytes()
+    rows = [data[y * width:(y + 1) * width].count(0) for y in range(height)]
+    mean = sum(rows) / height
+    return sum((r - mean) ** 2 for r in rows) / height
+
+
+def _estimate_skew(binary: Image.Image) -> float:
+    """Finds the small rotation that best aligns text rows, on a thumbnail for speed"""
+    thumb = binary.copy()
+    thumb.thumbnail((400, 400))
+    # Downscaling blends ink into grey; re-binarize so rows can be scored by black pixel count
+    thumb = thumb.point(lambda p: 0 if p < 128 else 255)
+    best_angle, best_score = 0.0, _row_profile_score(thumb)
+    steps = int(DESKEW_MAX_ANGLE / DESKEW_STEP)
+    for i in range(-steps, steps + 1):
+        angle = i * DESKEW_STEP
+        if angle == 0:
+            continue
+        rotated = thumb.rotate(angle, expand=False, fillcolor=255)
+        score = _row_profile_score(rotated)
+        if score > best_score:
+            best_angle, best_score = angle, score
+    return best_angle
+
+
+def _ink_profile(binary: Image.Image, box, columns=False) -> list:
+    """Black pixels per row of `box` (or per column with columns=True)"""
+    region = binary.crop(box)
+    if columns:
+        region = region.transpose(Image.Transpose.TRANSPOSE)
+    width, height = region.size
+    data = region.tobytes()
+    return [data[y * width:(y + 1) * width].count(0) for y in range(height)]
+
+
+def _ink_runs(profile, limit, min_gap):
+    """(start, end) spans of entries with more than `limit` ink, split at gaps of `min_gap` or more"""
+    runs, start, end, gap = [], None, 0, 0
+    for i, count in enumerate(profile):
+        if count > limit:
+            if start is None:
+                start = i
+            end, gap = i + 1, 0
+        elif start is not None:
+            gap += 1
+            if gap >= min_gap:
+                runs.append((start, end))
+                start = None
+    if start is not None:
+        runs.append((start, end))
+    return runs
+
+
+def _cut_spans(runs, length):
+    """Child spans for `runs`, each reaching halfway into the gaps around it so no ink is cut off"""
+    cuts = [0] + [(prev_end + next_start) // 2 for (_, prev_end), (next_start, _) in zip(runs, runs[1:])]
+    return list(zip(cuts, cuts[1:] + [length]))
+
+
+def _xy_cut(binary: Image.Image, box, blocks, depth=0):
+    """Splits `box` at empty rows, then at wide empty columns, recursively; leaves go to `blocks`"""
+    left, top, right, bottom = box
+    row_runs = _ink_runs(_ink_profile(binary, box), EMPTY_LINE_INK * (right - left), MIN_ROW_GAP)
+    if not row_runs:
+        return
+    if len(row_runs) > 1 and depth < 32:
+        for start, end in _cut_spans(row_runs, bottom - top):
+            _xy_cut(binary, (left, top + start, right, top + end), blocks, depth + 1)
+        return
+    band_height = row_runs[0][1] - row_runs[0][0]
+    column_runs = _ink_runs(_ink_profile(binary, box, columns=True), EMPTY_LINE_INK * band_height,
+                            min(max(MIN_COLUMN_GAP, band_height // 2), MAX_COLUMN_GAP))
+    if not column_runs:
+        return
+    if len(column_runs) > 1 and depth < 32:
+        for start, end in _cut_spans(column_runs, right - left):
+            _xy_cut(binary, (left + start, top, left + end, bottom), blocks, depth + 1)
+        return
+    band = (left, top + row_runs[0][0], right, top + row_runs[0][1])
+    ink = ImageOps.invert(binary.crop(band)).getbbox()
+    if ink:
+        blocks.append((left + ink[0], band[1] + ink[1], left + ink[2], band[1] + ink[3]))
+
+
+def _text_regions(binary: Image.Image) -> list:
+    """
+    Boxes of the text blocks on the page: lines and words found by XY-cut, minus frame lines,
+    specks, and tall dense blocks (the photo, QR code and emblem on an ID card).
+    """
+    blocks = []
+    _xy_cut(binary, (0, 0) + binary.size, blocks)
+    candidates = []
+    for box in blocks:
+        width, height = box[2] - box[0], box[3] - box[1]
+        thin, long = min(width, height), max(width, height)
+        if thin < RULE_THICKNESS and (long >= 4 * thin or long < RULE_THICKNESS):
+            continue
+        candidates.append(box)
+    if not candidates:
+        return []
+    heights = sorted(box[3] - box[1] for box in candidates)
+    median_height = heights[len(heights) // 2]
+    regions = []
+    for box in candidates:
+        width, height = box[2] - box[0], box[3] - box[1]
+        if height > MAX_LINE_HEIGHT_RATIO * median_height:
+            density = binary.crop(box).tobytes().count(0) / (width * height)
+            if density > TEXT_MAX_DENSITY:
+                continue
+        regions.append(box)
+    return regions
+
+
+def _keep_text_regions(binary: Image.Image) -> Image.Image:
+    """
+    Blanks everything outside the detected text regions and crops to them (plus CROP_MARGIN),
+    so Tesseract only sees text. Falls back to the bounding box of all ink when no region is found.
+    """
+    regions = _text_regions(binary)
+    width, height = binary.size
+    if regions:
+        regions = [(max(0, box[0] - REGION_PADDING), max(0, box[1] - REGION_PADDING),
+                    min(width, box[2] + REGION_PADDING), min(height, box[3] + REGION_PADDING))
+                   for box in regions]
+        masked = Image.new("L", binary.size, 255)
+        for box in regions:
+            masked.paste(binary.crop(box), box[:2])
+        bbox = (min(b[0] for b in regions), min(b[1] for b in regions),
+                max(b[2] for b in regions), max(b[3] for b in regions))
+        binary = masked
+    else:
+        bbox = ImageOps.invert(binary).getbbox()
+        if not bbox:
+            return binary
+    left, top, right, bottom = bbox
+    return binary.crop((max(0, left - CROP_MARGIN), max(0, top - CROP_MARGIN),
+                        min(width, right + CROP_MARGIN), min(height, bottom + CROP_MARGIN)))
+
+
+def preprocess_image(image: Image.Image, downscale: bool = True) -> Image.Image:
+    """
+    Prepares a scan for Tesseract: grayscale, downscale to TARGET_MAX_SIDE,
+    Otsu binarization, deskew, and restriction to the detected text regions.
+    Pages rendered at a known DPI (e.g. from PDFs) pass downscale=False to keep that density.
+    """
+    image = ImageOps.exif_transpose(image)
+    gray = image.convert("L")
+    if downscale and max(gray.size) > TARGET_MAX_SIDE:
+        gray.thumbnail((TARGET_MAX_SIDE, TARGET_MAX_SIDE), Image.LANCZOS)
+
+    threshold = _otsu_threshold(gray)
+    binary = gray.point(lambda p: 255 if p > threshold else 0, mode="L")
+
+    angle = _estimate_skew(binary)
+    if angle:
+        binary = binary.rotate(angle, resample=Image.NEAREST, expand=True, fillcolor=255)
+
+    return _keep_text_regions(binary)
+
+
+# --- Worker process state ---
+_tess_api = None
+
+def _init_worker():
+    """
+    Runs once per worker process. With tesserocr installed the Tesseract engine is loaded
+    here and reused for every page; otherwise each call shells out through pytesseract.
+    """
+    global _tess_api
+    try:
+        import tesserocr
+
+        _tess_api = tesserocr.PyTessBaseAPI(lang=TESSERACT_LANG, psm=TESSERACT_PSM)
+    except ImportError:
+        import pytesseract  # noqa: F401  (imported once so per-call overhead is only the subprocess)
+
+        _tess_api = None
+
+
+def _recognize(image: Image.Image) -> str:
+    if _tess_api is not None:
+        _tess_api.SetImage(image)
+        return _tess_api.GetUTF8Text()
+    import pytesseract
+
+    return pytesseract.image_to_string(image, lang=TESSERACT_LANG, config=f"--psm {TESSERACT_PSM}")
+
+
+def ocr_worker(data: bytes, preprocess: bool = True, downscale: bool = True):
+    """
+    OCR one encoded image inside a worker process.
+    Returns (text, seconds) so the parent can keep stats without timing the queue wait.
+    """
+    start = time.perf_counter()
+    with Image.open(io.BytesIO(data)) as image:
+        prepared = preprocess_image(image, downscale) if preprocess else image.convert("RGB")
+        text = _recognize(prepared)
+    return text.strip(), time.perf_counter() - start
+
+
+class OCREngine:
+    """
+    A pool of warm OCR worker processes with preprocessing and throughput/latency stats.
+
+    Workers are started eagerly so the first request does not pay process start-up and
+    Tesseract initialization.
+    """
+
+    def __init__(self, workers=None, preprocess=True):
+        self.workers = workers or os.cpu_count() or 1
+        self.preprocess = preprocess
+        self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=1000)
+        self._pages = 0
+        self._busy_seconds = 0.0
+        self._started = time.perf_counter()
+        # Touch every worker once so they are all initialized before traffic arrives
+        for future in [self._pool.submit(time.sleep, 0) for _ in range(self.workers)]:
+            future.result()
+
+    @classmethod
+    def from_env(cls):
+        """Pool size from KYC_OCR_WORKERS; OCR_PREPROCESS=0 disables preprocessing"""
+        workers = os.getenv("KYC_OCR_WORKERS")
+        return cls(workers=int(workers) if workers else None,
+                   preprocess=os.getenv("OCR_PREPROCESS", "1") != "0")
+
+    def _record(self, seconds):
+        with self._lock:
+            self._pages += 1
+            self._busy_seconds += seconds
+            self._latencies.append(seconds)
+
+    def submit(self, data: bytes, downscale: bool = True) -> Future:
+        """Queues one encoded image; the returned future resolves to the OCR text"""
+        text_future = Future()
+
+        def _done(worker_future):
+            try:
+                text, seconds = worker_future.result()
+            except BaseException as e:
+                text_future.set_exception(e)
+                return
+            self._record(seconds)
+            text_future.set_result(text)
+
+        self._pool.submit(ocr_worker, data, self.preprocess, downscale).add_done_callback(_done)
+        return text_future
+
+    def stats(self) -> dict:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            pages, busy = self._pages, self._busy_seconds
+        uptime = time.perf_counter() - self._started
+
+        def pct(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))], 4)
+
+        return {
+            "workers": self.workers,
+            "preprocess": self.preprocess,
+            "pages": pages,
+            "pages_per_second": round(pages / uptime, 3) if uptime else None,
+            "worker_utilization": round(busy / (uptime * self.workers), 3) if uptime else None,
+            "p50_seconds": pct(50),
+            "p95_seconds": pct(95),
+        }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_ocr_engine() -> OCREngine:
+    """The process-wide OCR engine, started on first use"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = OCREngine.from_env()
+        return _engine
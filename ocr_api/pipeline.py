@@ -0,0 +1,192 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+from agent import allm_extract, aocr_documents, combine_document_texts, to_kyc_response
+from kyc_cache import KYCCache, content_key, etag_key
+from kyc_validation import KYCResponse
+from fastapi import HTTPException
+from pydantic import ValidationError
+from lab import S3_BUCKET, get_s3_etag, get_s3_file, s3_key
+from ocr_engine import get_ocr_engine
+from rule_extractor import extract_with_rules, merge_with_llm, unresolved_fields
+
+
+class StageMetrics:
+    """Tracks call counts, failures, in-flight requests and recent latencies for one pipeline stage"""
+
+    def __init__(self, window=1000):
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+        self.errors = 0
+        self.in_flight = 0
+        self.total_seconds = 0.0
+
+    @asynccontextmanager
+    async def track(self):
+        with self._lock:
+            self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            with self._lock:
+                self.errors += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.in_flight -= 1
+                self.count += 1
+                self.total_seconds += elapsed
+                self._latencies.append(elapsed)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            latencies = sorted(self._latencies)
+            count, errors, in_flight, total = self.count, self.errors, self.in_flight, self.total_seconds
+
+        def pct(p):
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))], 4)
+
+        return {
+            "count": count,
+            "errors": errors,
+            "in_flight": in_flight,
+            "avg_seconds": round(total / count, 4) if count else None,
+            "p50_seconds": pct(50),
+            "p95_seconds": pct(95),
+            "max_seconds": round(latencies[-1], 4) if latencies else None,
+        }
+
+
+def _download_bytes(userId: str, etag: str) -> bytes:
+    with get_s3_file(userId, etag) as document:
+        return document.read()
+
+
+def _cached_kyc(entry):
+    """The cached result as a KYCResponse; entries written before schema validation may not parse and count as misses"""
+    if not entry or not entry.get("kyc"):
+        return None
+    try:
+        return KYCResponse.model_validate(entry["kyc"])
+    except ValidationError:
+        return None
+
+
+class KYCPipeline:
+    """
+    Runs the KYC stages without blocking the event loop.
+
+    - fetch: boto3 download in a worker thread, at most `s3_concurrency` at once
+    - ocr: every page in parallel on the shared OCREngine worker pool
+    - llm: the async LangChain chain, at most `llm_concurrency` calls at once
+
+    Each stage waits on its own semaphore, so a backlog in one stage does not starve the others.
+    """
+
+    def __init__(self, s3_concurrency=16, ocr_concurrency=None, llm_concurrency=8, ocr_engine=None, cache=None):
+        self.ocr = ocr_engine or get_ocr_engine()
+        self.cache = cache or KYCCache.from_env()
+        self.resolved_by_rules = 0
+        self.limits = {"fetch": s3_concurrency, "ocr": ocr_concurrency or self.ocr.workers, "llm": llm_concurrency}
+        self._semaphores = {stage: asyncio.Semaphore(limit) for stage, limit in self.limits.items()}
+        self.metrics = {stage: StageMetrics() for stage in ("fetch", "ocr", "llm", "total")}
+
+    @classmethod
+    def from_env(cls):
+        """
+        Limits come from KYC_S3_CONCURRENCY, KYC_OCR_CONCURRENCY (documents in OCR at once,
+        defaults to the pool size) and KYC_LLM_CONCURRENCY; the pool itself from KYC_OCR_WORKERS.
+        """
+        ocr_concurrency = os.getenv("KYC_OCR_CONCURRENCY")
+        return cls(
+            s3_concurrency=int(os.getenv("KYC_S3_CONCURRENCY", "16")),
+            ocr_concurrency=int(ocr_concurrency) if ocr_concurrency else None,
+            llm_concurrency=int(os.getenv("KYC_LLM_CONCURRENCY", "8")),
+        )
+
+    @asynccontextmanager
+    async def _stage(self, name):
+        async with self._semaphores[name]:
+            async with self.metrics[name].track():
+                yield
+
+    async def process(self, userId: str, refresh: bool = False) -> KYCResponse:
+        """
+        Fetch, OCR and extract the KYC document of one user.
+
+        Results are cached by the S3 ETag and by the SHA-256 of the document bytes: an unchanged
+        object costs one HEAD request, and a re-uploaded identical file skips OCR and the LLM.
+        `refresh` ignores cached entries and reprocesses the document.
+        Raises KYCExtractionError when no schema-valid result can be extracted.
+        """
+        async with self.metrics["total"].track():
+            async with self._stage("fetch"):
+                for attempt in range(2):
+                    etag = await asyncio.to_thread(get_s3_etag, userId)
+                    object_key = etag_key(S3_BUCKET, s3_key(userId), etag)
+                    entry = None if refresh else self.cache.get(object_key)
+                    cached = _cached_kyc(entry)
+                    if cached:
+                        return cached
+                    try:
+                        # Conditional on the ETag, so the bytes cached under object_key are that version
+                        data = await asyncio.to_thread(_download_bytes, userId, etag)
+                        break
+                    except HTTPException as e:
+                        # Overwritten between the HEAD and the download: look up the new version once
+                        if e.status_code != 412 or attempt:
+                            raise
+
+            document_key = content_key(data)
+            entry = None if refresh else self.cache.get(document_key)
+            cached = _cached_kyc(entry)
+            if cached:
+                self.cache.set(object_key, entry)
+                return cached
+
+            if entry and entry.get("ocr_text"):
+                texts = entry["ocr_text"]
+            else:
+                async with self._stage("ocr"):
+                    texts = await aocr_documents({"document": data}, self.ocr)
+                # OCR is kept even if extraction fails, so a retry only pays for the LLM
+                self.cache.set(document_key, {"ocr_text": texts})
+
+            combined_text = combine_document_texts(texts)
+            values, confidences = extract_with_rules(combined_text)
+            unresolved = unresolved_fields(confidences)
+            if unresolved:
+                async with self._stage("llm"):
+                    result = merge_with_llm(values, confidences, await allm_extract(combined_text, unresolved))
+            else:
+                # Every field was recovered deterministically; the LLM is skipped entirely
+                self.resolved_by_rules += 1
+                result = values
+
+            # Only schema-valid results reach the cache; anything else raises here
+            kyc = to_kyc_response(result)
+            entry = {"ocr_text": texts, "kyc": kyc.model_dump()}
+            self.cache.set(document_key, entry)
+            self.cache.set(object_key, entry)
+            return kyc
+
+    def stats(self) -> dict:
+        return {
+            "limits": self.limits,
+            "stages": {stage: metrics.snapshot() for stage, metrics in self.metrics.items()},
+            "ocr_engine": self.ocr.stats(),
+            "cache": self.cache.stats(),
+            "resolved_by_rules": self.resolved_by_rules,
+        }
+
+    def shutdown(self):
+        self.ocr.shutdown()
@@ -0,0 +1,137 @@
+import os
+import re
+from datetime import datetime
+
+# Fields at or above this confidence are trusted without asking the LLM
+MIN_CONFIDENCE = float(os.getenv("KYC_RULE_MIN_CONFIDENCE", "0.8"))
+
+FIELDS = ["documentType", "documentId", "fullName", "dateOfBirth", "gender", "address"]
+
+# --- Verhoeff checksum (used by Aadhaar numbers) ---
+_VERHOEFF_D = [
+    [0, 1, 2, 3, 4, 5, 6, 7, 8, 9], [1, 2, 3, 4, 0, 6, 7, 8, 9, 5],
+    [2, 3, 4, 0, 1, 7, 8, 9, 5, 6], [3, 4, 0, 1, 2, 8, 9, 5, 6, 7],
+    [4, 0, 1, 2, 3, 9, 5, 6, 7, 8], [5, 9, 8, 7, 6, 0, 4, 3, 2, 1],
+    [6, 5, 9, 8, 7, 1, 0, 4, 3, 2], [7, 6, 5, 9, 8, 2, 1, 0, 4, 3],
+    [8, 7, 6, 5, 9, 3, 2, 1, 0, 4], [9, 8, 7, 6, 5, 4, 3, 2, 1, 0],
+]
+_VERHOEFF_P = [
+    [0, 1, 2, 3, 4, 5, 6, 7, 8, 9], [1, 5, 7, 6, 2, 8, 3, 0, 9, 4],
+    [5, 8, 0, 3, 7, 9, 6, 1, 4, 2], [8, 9, 1, 6, 0, 4, 3, 5, 2, 7],
+    [9, 4, 5, 3, 1, 2, 6, 8, 7, 0], [4, 2, 8, 6, 5, 7, 3, 9, 0, 1],
+    [2, 7, 9, 3, 8, 0, 6, 4, 1, 5], [7, 0, 4, 6, 9, 1, 3, 2, 5, 8],
+]
+
+
+def verhoeff_valid(number: str) -> bool:
+    check = 0
+    for i, digit in enumerate(reversed(number)):
+        check = _VERHOEFF_D[check][_VERHOEFF_P[i % 8][int(digit)]]
+    return check == 0
+
+
+# --- Field patterns ---
+# Not part of a longer digit run: a 16-digit VID ("1234 5678 9012 3456") holds two 12-digit windows
+_AADHAAR_NUMBER = re.compile(r"(?<![\d-])(?<!\d[ -])([2-9]\d{3})[ -]?(\d{4})[ -]?(\d{4})(?![ -]?\d)(?!-)")
+_LABELLED_DOB = re.compile(r"(?:DOB|D\.O\.B|Date of Birth|Birth)\s*[:\-]?\s*(\d{2})[/\-.](\d{2})[/\-.](\d{4})", re.IGNORECASE)
+_ANY_DATE = re.compile(r"(?<!\d)(\d{2})[/\-.](\d{2})[/\-.](\d{4})(?!\d)")
+# Labels of the other dates printed on e-Aadhaar letters, checked just before an unlabelled date
+_OTHER_DATE_LABEL = re.compile(r"(?:Issue|Issued|Download(?:ed)?|Print(?:ed)?|Generat(?:ion|ed))\b[^\n\d]{0,15}$", re.IGNORECASE)
+_GENDER = re.compile(r"\b(FEMALE|MALE)\b", re.IGNORECASE)
+_ADDRESS = re.compile(r"Address\s*[:\-]?\s*(.+?\b\d{6}\b)", re.IGNORECASE | re.DOTALL)
+_NAME_LINE = re.compile(r"^[A-Za-z][A-Za-z.]*(?: [A-Za-z][A-Za-z.]*){1,3}$")
+_NAME_STOPWORDS = {"government", "india", "aadhaar", "aadhar", "unique", "identification", "authority",
+                   "father", "husband", "address", "male", "female", "dob", "birth", "year"}
+
+
+def _valid_date(day, month, year) -> bool:
+    try:
+        born = datetime(int(year), int(month), int(day))
+    except ValueError:
+        return False
+    return 1900 <= born.year <= datetime.now().year
+
+
+def _document_id(text):
+    candidates = {"".join(m.groups()) for m in _AADHAAR_NUMBER.finditer(text)}
+    valid = [c for c in candidates if verhoeff_valid(c)]
+    if len(valid) == 1:
+        return valid[0], 0.98
+    if len(candidates) == 1:
+        # Right shape but failed the checksum: most likely an OCR misread of one digit
+        return candidates.pop(), 0.5
+    return None, 0.0
+
+
+def _date_of_birth(text):
+    labelled = [m.groups() for m in _LABELLED_DOB.finditer(text) if _valid_date(*m.groups())]
+    if labelled:
+        day, month, year = labelled[0]
+        return f"{day}/{month}/{year}", 0.95 if len(set(labelled)) == 1 else 0.6
+    dates = {
+        m.groups() for m in _ANY_DATE.finditer(text)
+        if _valid_date(*m.groups()) and not _OTHER_DATE_LABEL.search(text[max(0, m.start() - 30):m.start()])
+    }
+    if len(dates) == 1:
+        day, month, year = dates.pop()
+        # An unlabelled date may still be an issue or print date: below MIN_CONFIDENCE, so the LLM decides
+        return f"{day}/{month}/{year}", 0.6
+    return None, 0.0
+
+
+def _gender(text):
+    found = {m.group(1).upper() for m in _GENDER.finditer(text)}
+    if len(found) == 1:
+        return found.pop(), 0.95
+    return None, 0.0
+
+
+def _full_name(text):
+    """On Aadhaar cards the holder's name is the line right above the DOB line"""
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    for i, line in enumerate(lines):
+        if i and (_LABELLED_DOB.search(line) or re.search(r"Year of Birth", line, re.IGNORECASE)):
+            candidate = lines[i - 1]
+            words = {w.lower().strip(".") for w in candidate.split()}
+            if _NAME_LINE.match(candidate) and not words & _NAME_STOPWORDS:
+                return candidate.title(), 0.85
+            return None, 0.0
+    return None, 0.0
+
+
+def _address(text):
+    match = _ADDRESS.search(text)
+    if not match:
+        return None, 0.0
+    address = re.sub(r"\s+", " ", match.group(1)).strip(" ,")
+    return address, 0.85
+
+
+def extract_with_rules(text: str):
+    """
+    Deterministic extraction of the KYC schema fields from Aadhaar OCR text.
+
+    Returns:
+        tuple: (values, confidences) keyed by field name. Fields that could not be
+        recovered are None with confidence 0.
+    """
+    values, confidences = {}, {}
+    # Only Aadhaar is supported by the schema, so the document type is known up front
+    values["documentType"], confidences["documentType"] = "AADHAR", 1.0
+    for field, extractor in (("documentId", _document_id), ("dateOfBirth", _date_of_birth),
+                             ("gender", _gender), ("fullName", _full_name), ("address", _address)):
+        values[field], confidences[field] = extractor(text)
+    return values, confidences
+
+
+def unresolved_fields(confidences: dict, min_confidence: float = MIN_CONFIDENCE) -> list:
+    return [field for field in FIELDS if confidences.get(field, 0.0) < min_confidence]
+
+
+def merge_with_llm(values: dict, confidences: dict, llm_result: dict, min_confidence: float = MIN_CONFIDENCE) -> dict:
+    """Confident rule-based values win; the LLM fills everything else"""
+    merged = dict(llm_result) if isinstance(llm_result, dict) else {}
+    for field in FIELDS:
+        if confidences.get(field, 0.0) >= min_confidence:
+            merged[field] = values[field]
+    return merged
@@ -0,0 +1,119 @@
+import os
+import shutil
+import threading
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+# Connection pool sized for many concurrent downloads from one process
+MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", "64"))
+
+# Scans above the threshold are fetched as concurrent ranged GETs
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=int(os.getenv("S3_MULTIPART_THRESHOLD", str(8 * 1024 * 1024))),
+    multipart_chunksize=int(os.getenv("S3_MULTIPART_CHUNKSIZE", str(8 * 1024 * 1024))),
+    max_concurrency=int(os.getenv("S3_MAX_TRANSFER_CONCURRENCY", "8")),
+    use_threads=True,
+)
+
+_client = None
+_client_lock = threading.Lock()
+
+
+class LocalS3Client:
+    """
+    Filesystem stand-in for the subset of the S3 client used by ocr_api, for local runs and tests.
+    Objects live at `<root>/<bucket>/<key>`; the ETag is derived from size and mtime.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, bucket, key):
+        return os.path.join(self.root, bucket, *key.split("/"))
+
+    def _not_found(self, operation):
+        return ClientError({"Error": {"Code": "404", "Message": "Not Found"}}, operation)
+
+    def head_object(self, Bucket, Key):
+        try:
+            stat = os.stat(self._path(Bucket, Key))
+        except FileNotFoundError:
+            raise self._not_found("HeadObject")
+        return {"ETag": f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"', "ContentLength": stat.st_size}
+
+    def get_object(self, Bucket, Key, IfMatch=None):
+        try:
+            body = open(self._path(Bucket, Key), "rb")
+        except FileNotFoundError:
+            raise self._not_found("GetObject")
+        stat = os.fstat(body.fileno())
+        etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+        if IfMatch is not None and IfMatch.strip('"') != etag.strip('"'):
+            body.close()
+            raise ClientError({"Error": {"Code": "PreconditionFailed", "Message": "At least one of the "
+                                         "pre-conditions you specified did not hold"}}, "GetObject")
+        return {"Body": body, "ETag": etag, "ContentLength": stat.st_size}
+
+    def download_fileobj(self, Bucket, Key, Fileobj, ExtraArgs=None, Config=None):
+        try:
+            with open(self._path(Bucket, Key), "rb") as f:
+                shutil.copyfileobj(f, Fileobj)
+        except FileNotFoundError:
+            raise self._not_found("GetObject")
+
+    def get_paginator(self, operation_name):
+        if operation_name != "list_objects_v2":
+            raise NotImplementedError(operation_name)
+        return _LocalListPaginator(self)
+
+
+class _LocalListPaginator:
+    def __init__(self, client, page_size=1000):
+        self.client = client
+        self.page_size = page_size
+
+    def paginate(self, Bucket, Prefix=""):
+        bucket_root = os.path.join(self.client.root, Bucket)
+        keys = []
+        for directory, _, files in os.walk(bucket_root):
+            for name in files:
+                key = os.path.relpath(os.path.join(directory, name), bucket_root).replace(os.sep, "/")
+                if key.startswith(Prefix):
+                    keys.append(key)
+        keys.sort()
+        for i in range(0, len(keys), self.page_size):
+            yield {"Contents": [{"Key": key} for key in keys[i:i + self.page_size]]}
+
+
+def get_s3_client():
+    """
+    The process-wide S3 client, created on first use.
+
+    boto3 clients are thread-safe, so one client with a large connection pool serves every
+    request. S3_ENDPOINT_URL points it at an S3-compatible stand-in (e.g. a moto server);
+    S3_LOCAL_DIR replaces it with the filesystem-backed LocalS3Client.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                local_dir = os.getenv("S3_LOCAL_DIR")
+                if local_dir:
+                    _client = LocalS3Client(local_dir)
+                else:
+                    _client = boto3.session.Session().client(
+                        's3',
+                        aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
+                        aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
+                        region_name=os.getenv('AWS_REGION', 'us-east-1'),
+                        endpoint_url=os.getenv('S3_ENDPOINT_URL') or None,
+                        config=Config(
+                            max_pool_connections=MAX_POOL_CONNECTIONS,
+                            retries={"max_attempts": 5, "mode": "adaptive"},
+                            tcp_keepalive=True,
+                        ),
+                    )
+    return _client
@@ -0,0 +1,210 @@
+import json
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from portfolio_construction.instrumentation import registry
+
+
+class ArtifactSink:
+    """
+    Destination for the intermediate outputs of a workflow run (profile, portfolio, report ...).
+    Objects are addressed by a namespace (one per run) and a name within it.
+    """
+
+    name = "base"
+
+    def put(self, namespace: str, name: str, data: bytes):
+        raise NotImplementedError
+
+
+class NullSink(ArtifactSink):
+    """Keeps nothing; the workflow result only lives in the response."""
+
+    name = "none"
+
+    def put(self, namespace, name, data):
+        pass
+
+
+class LocalDirSink(ArtifactSink):
+    """
+    Writes `<root>/<namespace>/<name>`, atomically so readers never see a partial file.
+    Keeps the newest `max_runs` namespaces (including those left by earlier processes) and deletes
+    older ones as new runs arrive. Meant to be driven by one ArtifactWriter thread.
+    """
+
+    name = "local"
+
+    def __init__(self, root="artifacts", max_runs=500):
+        self.root = root
+        self.max_runs = max_runs
+        # Existing runs, oldest first; namespaces are "<client id>/<run id>"
+        existing = []
+        if os.path.isdir(root):
+            for client in os.listdir(root):
+                client_dir = os.path.join(root, client)
+                if os.path.isdir(client_dir):
+                    existing += [os.path.join(client_dir, run) for run in os.listdir(client_dir)]
+        existing.sort(key=lambda path: os.path.getmtime(path))
+        self._runs = deque(os.path.relpath(path, root) for path in existing)
+        self._known = set(self._runs)
+
+    def _prune(self):
+        while len(self._runs) > self.max_runs:
+            oldest = self._runs.popleft()
+            self._known.discard(oldest)
+            shutil.rmtree(os.path.join(self.root, oldest), ignore_errors=True)
+            client_dir = os.path.dirname(os.path.join(self.root, oldest))
+            if os.path.isdir(client_dir) and not os.listdir(client_dir):
+                os.rmdir(client_dir)
+
+    def put(self, namespace, name, data):
+        namespace = os.path.normpath(namespace)
+        if namespace not in self._known:
+            self._known.add(namespace)
+            self._runs.append(namespace)
+            self._prune()
+        path = os.path.join(self.root, namespace, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+
+class MemoryObjectStore(ArtifactSink):
+    """
+    In-process stand-in for an object store (S3/GCS style flat keys `<namespace>/<name>`).
+    Holds at most `max_objects`, evicting the oldest, so it is safe to leave on in a server.
+    """
+
+    name = "memory"
+
+    def __init__(self, max_objects=1024):
+        self.max_objects = max_objects
+        self._objects = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, namespace, name, data):
+        with self._lock:
+            self._objects[f"{namespace}/{name}"] = data
+            self._objects.move_to_end(f"{namespace}/{name}")
+            while len(self._objects) > self.max_objects:
+                self._objects.popitem(last=False)
+
+    def get(self, key):
+        with self._lock:
+            return self._objects.get(key)
+
+    def list(self, prefix=""):
+        with self._lock:
+            return [key for key in self._objects if key.startswith(prefix)]
+
+
+def get_artifact_sink() -> ArtifactSink:
+    """
+    Builds the sink selected by ARTIFACT_SINK ("memory" by default, "local" or "none").
+    The memory store keeps ARTIFACT_MEMORY_OBJECTS objects; the local sink writes under ARTIFACT_DIR
+    and keeps the newest ARTIFACT_MAX_RUNS runs.
+    """
+    sink = os.getenv("ARTIFACT_SINK", "memory").lower()
+    if sink == "local":
+        return LocalDirSink(os.getenv("ARTIFACT_DIR", "artifacts"), max_runs=int(os.getenv("ARTIFACT_MAX_RUNS", "500")))
+    if sink == "memory":
+        return MemoryObjectStore(int(os.getenv("ARTIFACT_MEMORY_OBJECTS", "1024")))
+    if sink == "none":
+        return NullSink()
+    raise ValueError(f"Unknown ARTIFACT_SINK '{sink}'. Expected 'local', 'memory' or 'none'.")
+
+
+class ArtifactWriter:
+    """
+    Hands artifacts to a sink from a background thread, so storage never sits on the request path.
+
+    Values are serialized by the caller (cheap for these small documents, and it snapshots them
+    before the caller can mutate them); only the sink write is deferred. The queue is bounded:
+    when the sink falls behind, new artifacts are dropped and counted rather than blocking requests.
+    """
+
+    def __init__(self, sink: ArtifactSink, max_pending=1000):
+        self.sink = sink
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._drain, name="artifact-writer", daemon=True)
+                self._thread.start()
+
+    def _drain(self):
+        while True:
+            namespace, name, data = self._queue.get()
+            labels = (("sink", self.sink.name),)
+            start = time.perf_counter()
+            try:
+                self.sink.put(namespace, name, data)
+                with self._lock:
+                    self.written += 1
+                registry.observe("portfolio_artifact_write_seconds", labels, time.perf_counter() - start)
+            except Exception as e:
+                with self._lock:
+                    self.failed += 1
+                registry.increment("portfolio_artifact_write_errors_total", labels)
+                print(f"Warning: could not store artifact {namespace}/{name}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def submit(self, namespace: str, name: str, value):
+        """Queues one artifact; dicts and lists are stored as JSON, strings as UTF-8 text."""
+        if isinstance(self.sink, NullSink):
+            return
+        if isinstance(value, (bytes, str)):
+            data = value.encode("utf-8") if isinstance(value, str) else value
+        else:
+            data = json.dumps(value, indent=2, default=str).encode("utf-8")
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((namespace, name, data))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            registry.increment("portfolio_artifacts_dropped_total", (("sink", self.sink.name),))
+
+    def flush(self):
+        """Blocks until every queued artifact has been handed to the sink (for scripts and shutdown)."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sink": self.sink.name,
+                "pending": self._queue.qsize(),
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+            }
+
+
+class RunArtifacts:
+    """The artifacts of one workflow run, namespaced `<client id>/<run id>` so concurrent runs never collide."""
+
+    def __init__(self, writer: ArtifactWriter, client_id: str, run_id=None):
+        self.writer = writer
+        self.run_id = run_id or f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        # Client ids come from requests; keep them to one safe path segment for directory sinks
+        client_segment = re.sub(r"[^A-Za-z0-9_.-]", "_", client_id).strip(".") or "client"
+        self.namespace = f"{client_segment}/{self.run_id}"
+
+    def save(self, name: str, value):
+        self.writer.submit(self.namespace, name, value)
@@ -0,0 +1,102 @@
+"""
+Benchmark: legacy vs compact reporting prompt.
+
+Prints the prompt size (characters and estimated tokens, per section for the compact builder)
+for a representative profile/portfolio/analysis. With --generate N, also times N report
+generations with each prompt style against the configured model.
+
+Usage (from the repository root):
+    python -m portfolio_construction.bench_prompt
+    python -m portfolio_construction.bench_prompt --generate 3
+"""
+import argparse
+import statistics
+import time
+from portfolio_construction.prompt_builder import estimate_tokens
+from portfolio_construction.reporting_customization import ReportingAndCustomizationAgent
+
+SAMPLE_PROFILE = {
+    "clientId": "C-001",
+    "riskScore": 2.4,
+    "riskProfile": "Conservative",
+    "sentimentAnalysis": "-0.69 (from -1 to 1)",
+    "goals": ["My main goal is just to make sure my nest egg is safe for my retirement in about 10 years."],
+    "constraints": ["Avoid Volatile stocks", "Avoid Tech stocks"],
+    "investmentHorizon": 10,
+}
+
+SAMPLE_PORTFOLIO = {
+    "portfolioName": "C-001_Conservative_V1",
+    "assetAllocation": {"Equity": "28.51%", "Bonds": "71.49%"},
+    "holdings": [
+        {"ticker": "AGG", "percentage": 0.71489},
+        {"ticker": "VTI", "percentage": 0.20933},
+        {"ticker": "VXUS", "percentage": 0.07578},
+    ],
+    "rationale": "Optimized for minimum volatility to prioritize capital preservation.",
+}
+
+SAMPLE_ANALYSIS = {
+    "portfolio": {"AGG": 0.71489, "VTI": 0.20933, "VXUS": 0.07578},
+    "analysis_period_years": 10,
+    "backtest_results": {
+        "cagr": "3.41%",
+        "max_drawdown": "-21.87%",
+        "sharpe_ratio": "0.55",
+        "sortino_ratio": "0.77",
+        "annual_volatility": "6.52%",
+    },
+    "monte_carlo_forecast": {
+        "num_simulations": 1000,
+        "horizon_years": 10,
+        "10th_percentile_outcome": "$104,378.52",
+        "50th_percentile_outcome (Median)": "$140,113.09",
+        "90th_percentile_outcome": "$186,920.77",
+    },
+    "risk_warnings": [],
+}
+
+OPTIONS = {
+    "target_audience": "client",
+    "report_format": "markdown",
+    "tone": "professional and encouraging",
+}
+
+
+def _time_generation(agent, runs):
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        agent.generate_report(SAMPLE_PROFILE, SAMPLE_PORTFOLIO, SAMPLE_ANALYSIS, OPTIONS)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--generate", type=int, default=0, help="number of timed report generations per prompt style")
+    args = parser.parse_args()
+
+    results = {}
+    for label, compact in (("legacy", False), ("compact", True)):
+        agent = ReportingAndCustomizationAgent(use_cache=False, compact_prompt=compact)
+        prompt = agent._create_prompt(SAMPLE_PROFILE, SAMPLE_PORTFOLIO, SAMPLE_ANALYSIS, OPTIONS)
+        results[label] = {"agent": agent, "chars": len(prompt), "tokens": dict(agent.last_prompt_tokens)}
+
+    print("\n--- Prompt size ---")
+    for label, result in results.items():
+        print(f"{label:>8}: {result['chars']:>5} chars, ~{result['tokens']['total']} tokens")
+    print(f"Compact sections (estimated tokens): {results['compact']['tokens']}")
+    saved = 1 - results["compact"]["tokens"]["total"] / results["legacy"]["tokens"]["total"]
+    print(f"Token reduction: {saved:.1%}")
+
+    if args.generate:
+        print(f"\n--- Generation latency ({args.generate} runs each) ---")
+        for label, result in results.items():
+            latencies = _time_generation(result["agent"], args.generate)
+            print(f"{label:>8}: median {statistics.median(latencies):.2f}s, "
+                  f"min {min(latencies):.2f}s, max {max(latencies):.2f}s")
+
+
+if __name__ == "__main__":
+    main()
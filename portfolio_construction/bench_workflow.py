@@ -0,0 +1,81 @@
+"""
+Throughput and latency benchmark for the portfolio workflow.
+
+Runs N requests at the given concurrency and reports requests/second and latency percentiles
+(plus time to first chunk in --mode stream). Use LLM_BACKEND=fake to run without network access
+to the LLM; FAKE_LLM_LATENCY and FAKE_LLM_TOKENS_PER_SEC shape its timing.
+
+Modes:
+    report  profiling + report generation on the bundled sample portfolio (no market data needed)
+    stream  same as report, streaming the report and measuring time to first chunk
+    full    the whole /generate_portfolio_report pipeline (needs market data access)
+
+Usage (from the repository root):
+    LLM_BACKEND=fake python -m portfolio_construction.bench_workflow --requests 50 --concurrency 8
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from portfolio_construction.bench_prompt import SAMPLE_PORTFOLIO, SAMPLE_ANALYSIS, OPTIONS
+from portfolio_construction.client_profiler import ClientProfilerAgent
+from portfolio_construction.reporting_customization import ReportingAndCustomizationAgent
+
+CONVERSATION = (
+    "Honestly, I'm very nervous about the market right now. My main goal is just to make sure my "
+    "nest egg is safe for my retirement in about 10 years. I definitely don't want any part of volatile tech stocks."
+)
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["report", "stream", "full"], default="report")
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    profiler = ClientProfilerAgent()
+    # Caches are bypassed so every request does the full amount of work
+    reporting_agent = ReportingAndCustomizationAgent(use_cache=False)
+
+    def one_request(i):
+        # Each request gets distinct text so no layer can short-circuit on repeated input
+        message = f"{CONVERSATION} Request {i}."
+        start = time.perf_counter()
+        first_chunk = None
+        if args.mode == "full":
+            from portfolio_construction.genai_portfolio_workflow import _generate_portfolio_report
+            _generate_portfolio_report(f"C-{i:04d}", message)
+        else:
+            profile = profiler.run(f"C-{i:04d}", message)
+            if args.mode == "stream":
+                for _ in reporting_agent.generate_report_stream(profile, SAMPLE_PORTFOLIO, SAMPLE_ANALYSIS, OPTIONS):
+                    if first_chunk is None:
+                        first_chunk = time.perf_counter() - start
+            else:
+                reporting_agent.generate_report(profile, SAMPLE_PORTFOLIO, SAMPLE_ANALYSIS, OPTIONS)
+        return time.perf_counter() - start, first_chunk
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(one_request, range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    latencies = [latency for latency, _ in results]
+    print(f"\n--- {args.mode} mode: {args.requests} requests, concurrency {args.concurrency} ---")
+    print(f"Throughput: {args.requests / elapsed:.2f} req/s over {elapsed:.2f}s")
+    print(f"Latency: p50 {_percentile(latencies, 50):.3f}s, p95 {_percentile(latencies, 95):.3f}s, "
+          f"p99 {_percentile(latencies, 99):.3f}s, mean {statistics.mean(latencies):.3f}s")
+    first_chunks = [first for _, first in results if first is not None]
+    if first_chunks:
+        print(f"Time to first chunk: p50 {_percentile(first_chunks, 50):.3f}s, p95 {_percentile(first_chunks, 95):.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+
+def normalize_text(text: str) -> str:
+    """Collapses runs of whitespace so re-submitted text hashes to the same key."""
+    return " ".join(text.split())
+
+
+def content_hash(*parts) -> str:
+    """
+    Returns a stable SHA-256 hex digest of the given parts.
+    Dicts and lists are serialized canonically (sorted keys) before hashing.
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        if not isinstance(part, str):
+            part = json.dumps(part, sort_keys=True, separators=(",", ":"), default=str)
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class LRUCache:
+    """
+    A thread-safe, content-addressed LRU cache of JSON-serializable values.
+
+    Entries live in memory up to `max_entries`. If `disk_dir` is given, every entry is
+    also written there as `<key>.json`, and memory misses fall back to the disk tier.
+    """
+
+    def __init__(self, max_entries=256, disk_dir=None):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _remember(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key):
+        """Returns the cached value for `key`, or None on a miss."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+        value = None
+        if self.disk_dir:
+            try:
+                with open(self._disk_path(key), "r", encoding="utf-8") as f:
+                    value = json.load(f)
+            except (OSError, ValueError):
+                value = None
+
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._remember(key, value)
+        return value
+
+    def set(self, key, value):
+        """Stores `value` under `key` in memory and, if configured, on disk."""
+        with self._lock:
+            self._remember(key, value)
+
+        if self.disk_dir:
+            # Write to a temp file first so a concurrent reader never sees a partial entry; the name is
+            # unique per process and thread, as several workers may share the directory
+            tmp_path = f"{self._disk_path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(value, f)
+                os.replace(tmp_path, self._disk_path(key))
+            except OSError as e:
+                print(f"Warning: could not write cache entry {key} to disk: {e}")
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -1,7 +1,27 @@
+import os
 import nltk
 from nltk.sentiment.vader import SentimentIntensityAnalyzer
 from nltk.tokenize import sent_tokenize
 import re
+from portfolio_construction.cache import LRUCache, content_hash, normalize_text
+
+# Bump whenever the profiling logic changes so stale cached profiles are not reused
+PROFILER_VERSION = "1"
+
+_profile_cache = None
+
+def get_profile_cache():
+    """
+    Returns the shared profile cache, creating it on first use.
+    Size and the optional on-disk tier are configured via PROFILE_CACHE_SIZE and PROFILE_CACHE_DIR.
+    """
+    global _profile_cache
+    if _profile_cache is None:
+        _profile_cache = LRUCache(
+            max_entries=int(os.getenv("PROFILE_CACHE_SIZE", "512")),
+            disk_dir=os.getenv("PROFILE_CACHE_DIR") or None,
+        )
+    return _profile_cache
 
 class ClientProfilerAgent:
     def __init__(self):
@@ -101,6 +121,28 @@ class ClientProfilerAgent:
         
         return profile
 
+    # --- Content-addressed caching of profiles ---
+    def run_cached(self, client_id: str, conversation_text: str, cache: LRUCache = None):
+        """
+        Same as `run`, but serves repeat submissions of the same conversation from the profile cache.
+        The cache key is the hash of the whitespace-normalized text and PROFILER_VERSION, so the
+        profile is computed on the normalized text to keep cached and fresh results identical.
+        Returns a (profile, cache_hit) tuple.
+        """
+        cache = cache or get_profile_cache()
+        normalized_text = normalize_text(conversation_text)
+        key = content_hash(PROFILER_VERSION, normalized_text)
+
+        cached = cache.get(key)
+        if cached is not None:
+            print(f"Profile cache hit for client {client_id}.")
+            return {**cached, "clientId": client_id}, True
+
+        profile = self.run(client_id, normalized_text)
+        # The client id is not part of the content, so it is stripped from the cached entry
+        cache.set(key, {k: v for k, v in profile.items() if k != "clientId"})
+        return profile, False
+
 
 # --- Example of how to use the agent ---
 if __name__ == "__main__":
@@ -12,109 +12,276 @@ It demonstrates a full pipeline for generating a GenAI-powered financial portfol
 """
 import json
 import os
+import time
+from typing import Optional
 from portfolio_construction.client_profiler import ClientProfilerAgent
 from portfolio_construction.market_analysis import MarketResearchAgent
 from portfolio_construction.portfolio_construction import PortfolioConstructionAgent
 from portfolio_construction.portfolio_analysis import PortfolioAnalysisAgent
 from portfolio_construction.reporting_customization import ReportingAndCustomizationAgent
-from fastapi import FastAPI, Query
-from fastapi.responses import JSONResponse
+from portfolio_construction.artifacts import ArtifactWriter, RunArtifacts, get_artifact_sink
+from portfolio_construction.instrumentation import record_stage, render_prometheus, request_trace, stage
+from portfolio_construction.report_jobs import RETRY_AFTER_SECONDS, JobQueueFull, ReportJobQueue
+from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
 import uvicorn
 from fastmcp import FastMCP
 
 
+_profiler = None
+
+def get_profiler():
+    """Returns a shared ClientProfilerAgent so the VADER lexicon is loaded only once."""
+    global _profiler
+    if _profiler is None:
+        _profiler = ClientProfilerAgent()
+    return _profiler
+
+# --- Artifacts ---
+# Intermediate results are passed along in memory; copies go to the artifact sink in the background
+_artifact_writer = None
+
+def get_artifact_writer():
+    """Returns the shared ArtifactWriter for the sink selected by ARTIFACT_SINK."""
+    global _artifact_writer
+    if _artifact_writer is None:
+        _artifact_writer = ArtifactWriter(get_artifact_sink(),
+                                          max_pending=int(os.getenv("ARTIFACT_MAX_PENDING", "1000")))
+    return _artifact_writer
+
+def new_run_artifacts(client_id):
+    """A fresh artifact namespace for one workflow run."""
+    return RunArtifacts(get_artifact_writer(), client_id)
+
 # --- 1. Client Profiling ---
-def run_client_profiling(client_id, conversation_text):
-    profiler = ClientProfilerAgent()
-    profile = profiler.run(client_id, conversation_text)
-    with open(f"{client_id}_profile.json", "w", encoding="utf-8") as f:
-        json.dump(profile, f, indent=2)
-    print(f"[1] Client profile saved: {client_id}_profile.json")
+def run_client_profiling(client_id, conversation_text, artifacts=None):
+    with stage("client_profiling") as timing:
+        profile, cache_hit = get_profiler().run_cached(client_id, conversation_text)
+        timing["cache_hit"] = cache_hit
+    if artifacts is not None:
+        artifacts.save("profile.json", profile)
+    print(f"[1] Client profile {'served from cache' if cache_hit else 'built'} for {client_id}")
     return profile
 
 # --- 2. Market Research ---
-def run_market_research():
-    market_agent = MarketResearchAgent()
-    market_brief = market_agent.run()
-    with open("market_conditions_brief.json", "w", encoding="utf-8") as f:
-        json.dump(market_brief, f, indent=2)
-    print("[2] Market conditions brief saved: market_conditions_brief.json")
+def run_market_research(artifacts=None):
+    with stage("market_research"):
+        market_agent = MarketResearchAgent()
+        market_brief = market_agent.run()
+    if artifacts is not None:
+        artifacts.save("market_conditions_brief.json", market_brief)
+    print("[2] Market conditions brief ready")
     return market_brief
 
 # --- 3. Portfolio Construction ---
-def run_portfolio_construction(profile):
-    constructor = PortfolioConstructionAgent(profile)
-    portfolio = constructor.run()
-    with open(f"constructed_portfolio_{profile['clientId']}.json", "w", encoding="utf-8") as f:
-        json.dump(portfolio, f, indent=2)
-    print(f"[3] Constructed portfolio saved: constructed_portfolio_{profile['clientId']}.json")
+def run_portfolio_construction(profile, artifacts=None):
+    with stage("portfolio_construction"):
+        constructor = PortfolioConstructionAgent(profile)
+        portfolio = constructor.run()
+    if artifacts is not None:
+        artifacts.save("constructed_portfolio.json", portfolio)
+    print(f"[3] Portfolio constructed for {profile['clientId']}")
     return portfolio
 
 # --- 4. Portfolio Analysis ---
-def run_portfolio_analysis(portfolio, profile):
+def run_portfolio_analysis(portfolio, profile, artifacts=None):
     horizon = profile.get("investmentHorizon", 10) or 10
     initial_capital = 100000  # Default; could be customized
-    analysis_agent = PortfolioAnalysisAgent(portfolio, investment_horizon_years=horizon, initial_capital=initial_capital)
-    analysis = analysis_agent.run()
-    with open(f"portfolio_analysis_{profile['clientId']}.json", "w", encoding="utf-8") as f:
-        json.dump(analysis, f, indent=2)
-    print(f"[4] Portfolio analysis saved: portfolio_analysis_{profile['clientId']}.json")
+    with stage("portfolio_analysis"):
+        analysis_agent = PortfolioAnalysisAgent(portfolio, investment_horizon_years=horizon, initial_capital=initial_capital)
+        analysis = analysis_agent.run()
+    if artifacts is not None:
+        artifacts.save("portfolio_analysis.json", analysis)
+    print(f"[4] Portfolio analysed for {profile['clientId']}")
     return analysis
 
 # --- 5. Report Generation ---
-def run_report_generation(profile, portfolio, analysis, customization_options):
+def run_report_generation(profile, portfolio, analysis, customization_options, artifacts=None):
+    """Returns the report text; the markdown file is only written through the artifact sink."""
+    with stage("report_generation"):
+        reporting_agent = ReportingAndCustomizationAgent()
+        report = reporting_agent.generate_report(profile, portfolio, analysis, customization_options)
+    if artifacts is not None:
+        artifacts.save("client_report.md", report)
+    print(f"[5] Client report generated for {profile['clientId']}")
+    return report
+
+# --- 5b. Streaming Report Generation ---
+def stream_report_generation(profile, portfolio, analysis, customization_options, artifacts=None):
+    """
+    Yields report chunks as they are generated, then stores the full report once the stream completes.
+    """
     reporting_agent = ReportingAndCustomizationAgent()
-    report = reporting_agent.generate_report(profile, portfolio, analysis, customization_options)
-    report_filename = f"client_report_{profile['clientId']}.md"
-    with open(report_filename, "w", encoding="utf-8") as f:
-        f.write(report)
-    print(f"[5] Client report saved: {report_filename}")
-    return report_filename
+    chunks = []
+    # Timed by hand: a stage() block cannot span the yields of a generator run from a thread pool
+    started = time.perf_counter()
+    for chunk in reporting_agent.generate_report_stream(profile, portfolio, analysis, customization_options):
+        chunks.append(chunk)
+        yield chunk
+    record_stage("report_generation_stream", time.perf_counter() - started)
+    if artifacts is not None:
+        artifacts.save("client_report.md", "".join(chunks))
+    print(f"[5] Client report streamed for {profile['clientId']}")
+
+DEFAULT_CUSTOMIZATION_OPTIONS = {
+    "target_audience": "client",
+    "report_format": "markdown",
+    "tone": "professional and encouraging",
+}
+
+def _sse_event(event, data):
+    """Formats one Server-Sent Event. Data is JSON-encoded so newlines in markdown survive."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
 app = FastAPI(title="GenAI Portfolio Maker API")
 
 @app.get("/generate_portfolio_report")
 def generate_portfolio_report(
-    message: str = Query(..., description="Client's conversation text for profiling")
+    message: str = Query(..., description="Client's conversation text for profiling"),
+    include_timings: bool = Query(False, description="Add per-stage wall/CPU time, memory and external calls to the response")
 ):
     """Generates a financial portfolio report based on client input conversation text and a given client id.
     This endpoint profiles the client, conducts market research, constructs a portfolio,
     analyzes the portfolio, and generates a report.
     """
     client_id = "C-001"
+    with request_trace() as trace:
+        try:
+            response = _generate_portfolio_report(client_id, message)
+        except Exception as e:
+            return JSONResponse(status_code=500, content={"error": str(e)})
+    if include_timings:
+        response["timings"] = trace.summary()
+    return response
+
+def _generate_portfolio_report(client_id, message):
+    artifacts = new_run_artifacts(client_id)
+
+    # 1. Profile the client
+    profile = run_client_profiling(client_id, message, artifacts)
+
+    # 2. Get market research (optional for construction, but useful for reporting)
+    market_brief = run_market_research(artifacts)
+
+    # 3. Construct a portfolio
+    portfolio = run_portfolio_construction(profile, artifacts)
+
+    # 4. Analyze the portfolio
+    analysis = run_portfolio_analysis(portfolio, profile, artifacts)
+
+    # 5. Generate a report (for client)
+    customization_options = dict(DEFAULT_CUSTOMIZATION_OPTIONS)
+    report_content = run_report_generation(profile, portfolio, analysis, customization_options, artifacts)
+
+    return {
+        "client_report": report_content,
+        "run_id": artifacts.run_id,
+    }
+
+def _run_report_job(client_id, message):
+    """Job handler: the full workflow, with the per-stage timings always attached."""
+    with request_trace() as trace:
+        response = _generate_portfolio_report(client_id, message)
+    response["timings"] = trace.summary()
+    return response
+
+report_jobs = ReportJobQueue.from_env(_run_report_job)
+
+class ReportJobRequest(BaseModel):
+    message: str = Field(..., min_length=1, description="Client's conversation text for profiling")
+    client_id: str = Field("C-001", description="Identifies the client; also scopes duplicate detection and artifacts")
+    callback_url: Optional[str] = Field(None, pattern=r"^https?://", description="Receives a POST of the finished job")
+
+@app.post("/reports", status_code=202)
+def submit_report_job(request: ReportJobRequest):
+    """Queues a portfolio report and returns its job id at once; poll GET /reports/{job_id} for the result.
+    Re-submitting the same client id and conversation while a job for it is in flight returns that job.
+    Responds 429 with Retry-After when the worker pool and its queue are full, and 422 for a callback_url
+    that is not on REPORT_JOB_WEBHOOK_HOSTS or resolves to a private, loopback or link-local address.
+    """
     try:
-        # 1. Profile the client
-        profile = run_client_profiling(client_id, message)
+        job, created = report_jobs.submit(request.client_id, request.message, request.callback_url)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except JobQueueFull as e:
+        return JSONResponse(status_code=429, content={"error": str(e)},
+                            headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
+    return JSONResponse(status_code=202 if created else 200,
+                        content={**report_jobs.describe(job), "deduplicated": not created},
+                        headers={"Location": f"/reports/{job.id}"})
+
+@app.get("/reports/{job_id}")
+def get_report_job(job_id: str):
+    """Status of a report job (queued, running, done or failed), with the report once it is done."""
+    job = report_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job id")
+    return report_jobs.describe(job)
 
-        # 2. Get market research (optional for construction, but useful for reporting)
-        market_brief = run_market_research()
+@app.get("/reports")
+def report_job_stats():
+    """Worker pool size, queue capacity and the current number of queued and running jobs."""
+    return report_jobs.stats()
 
-        # 3. Construct a portfolio
-        portfolio = run_portfolio_construction(profile)
+@app.on_event("shutdown")
+def shutdown_workers():
+    report_jobs.shutdown()
+    get_artifact_writer().flush()
+
+@app.get("/generate_portfolio_report/stream")
+def generate_portfolio_report_stream(
+    message: str = Query(..., description="Client's conversation text for profiling"),
+    format: str = Query("sse", pattern="^(sse|text)$", description="'sse' for Server-Sent Events, 'text' for chunked markdown")
+):
+    """Streaming variant of /generate_portfolio_report.
+    With format=sse, emits a `stage` event as each workflow step completes, `chunk` events carrying
+    report fragments as the LLM produces them, and a final `done` (or `error`) event.
+    With format=text, streams only the raw markdown report as a chunked response.
+    """
+    client_id = "C-001"
+    artifacts = new_run_artifacts(client_id)
 
-        # 4. Analyze the portfolio
-        analysis = run_portfolio_analysis(portfolio, profile)
+    def event_stream():
+        try:
+            profile = run_client_profiling(client_id, message, artifacts)
+            yield _sse_event("stage", {"step": 1, "name": "client_profiling", "run_id": artifacts.run_id})
+            run_market_research(artifacts)
+            yield _sse_event("stage", {"step": 2, "name": "market_research"})
+            portfolio = run_portfolio_construction(profile, artifacts)
+            yield _sse_event("stage", {"step": 3, "name": "portfolio_construction"})
+            analysis = run_portfolio_analysis(portfolio, profile, artifacts)
+            yield _sse_event("stage", {"step": 4, "name": "portfolio_analysis"})
+            for chunk in stream_report_generation(profile, portfolio, analysis, dict(DEFAULT_CUSTOMIZATION_OPTIONS), artifacts):
+                yield _sse_event("chunk", {"text": chunk})
+            yield _sse_event("done", {"step": 5, "name": "report_generation"})
+        except Exception as e:
+            yield _sse_event("error", {"error": str(e)})
 
-        # 5. Generate a report (for client)
-        customization_options = {
-            "target_audience": "client",
-            "report_format": "markdown",
-            "tone": "professional and encouraging",
-        }
-        report_file = run_report_generation(profile, portfolio, analysis, customization_options)
+    def text_stream():
+        profile = run_client_profiling(client_id, message, artifacts)
+        run_market_research(artifacts)
+        portfolio = run_portfolio_construction(profile, artifacts)
+        analysis = run_portfolio_analysis(portfolio, profile, artifacts)
+        yield from stream_report_generation(profile, portfolio, analysis, dict(DEFAULT_CUSTOMIZATION_OPTIONS), artifacts)
 
-        # Read the generated report and return its content
-        with open(report_file, "r", encoding="utf-8") as f:
-            report_content = f.read()
+    if format == "text":
+        return StreamingResponse(text_stream(), media_type="text/markdown", headers={"X-Run-Id": artifacts.run_id})
+    # Disable proxy buffering so chunks reach the browser as soon as they are produced
+    return StreamingResponse(event_stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
-        return {
-            "client_report": report_content
-        }
-    except Exception as e:
-        return JSONResponse(status_code=500, content={"error": str(e)})
+@app.get("/metrics")
+def metrics():
+    """Stage durations, CPU time, external-call latencies, artifact writes, report job queue depth and errors
+    in the Prometheus text format."""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
 
 # --- MAIN WORKFLOW ---
 if __name__ == "__main__":
+    # A script run keeps its artifacts on disk unless told otherwise
+    os.environ.setdefault("ARTIFACT_SINK", "local")
+
     # --- Example client conversation (could be replaced with user input or file read) ---
     client_id = "C-001"
     conversation_text = """
@@ -158,17 +325,19 @@ if __name__ == "__main__":
     take advantage of new opportunities as they arise.
     """
 
+    artifacts = new_run_artifacts(client_id3)
+
     # 1. Profile the client
-    profile = run_client_profiling(client_id3, conversation_text3)
+    profile = run_client_profiling(client_id3, conversation_text3, artifacts)
 
     # 2. Get market research (optional for construction, but useful for reporting)
-    market_brief = run_market_research()
+    market_brief = run_market_research(artifacts)
 
     # 3. Construct a portfolio
-    portfolio = run_portfolio_construction(profile)
+    portfolio = run_portfolio_construction(profile, artifacts)
 
     # 4. Analyze the portfolio
-    analysis = run_portfolio_analysis(portfolio, profile)
+    analysis = run_portfolio_analysis(portfolio, profile, artifacts)
 
     # 5. Generate a report (for client)
     customization_options = {
@@ -177,8 +346,10 @@ if __name__ == "__main__":
         "tone": "professional and encouraging",
         # Optionally, you could add market_brief to the prompt for more context
     }
-    report_file = run_report_generation(profile, portfolio, analysis, customization_options)
+    report = run_report_generation(profile, portfolio, analysis, customization_options, artifacts)
 
-    print("\nWorkflow complete! Open the generated report for review.")
+    # The writer thread is a daemon; wait for it before the script exits
+    get_artifact_writer().flush()
+    print(f"\nWorkflow complete! Artifacts of run {artifacts.run_id}: {get_artifact_writer().stats()}")
     # To run the API: uncomment the following line
     # uvicorn.run("genai_portfolio_workflow:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,222 @@
+"""
+Per-stage timing, CPU, memory and external-call instrumentation for the portfolio workflow.
+
+- `stage(name)` times one workflow step (wall and CPU time, RSS growth, and optionally the
+  net Python allocation change when TRACE_MEMORY=1).
+- `external_call(kind)` times one call to a network service (yfinance, FRED, NewsAPI, the LLM).
+- `request_trace()` collects both for one request, so an endpoint can return a timing block.
+
+Everything also feeds a process-wide registry rendered in the Prometheus text format by
+`render_prometheus()`. The current trace is held in a context variable; stages and calls made
+outside a trace only update the registry.
+"""
+import contextvars
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# Histogram buckets in seconds, from cache hits up to multi-minute downloads
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+TRACE_MEMORY = os.getenv("TRACE_MEMORY", "0") == "1"
+if TRACE_MEMORY and not tracemalloc.is_tracing():
+    tracemalloc.start()
+
+_current_trace = contextvars.ContextVar("portfolio_trace", default=None)
+
+
+def _rss_bytes():
+    """Current resident set size from /proc (Linux), or None elsewhere"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class _Histogram:
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.total += value
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class MetricsRegistry:
+    """Thread-safe counters, gauges and histograms keyed by metric name and label values"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._gauges = {}
+
+    def observe(self, name, labels, value):
+        with self._lock:
+            self._histograms.setdefault((name, labels), _Histogram()).observe(value)
+
+    def increment(self, name, labels, value=1.0):
+        with self._lock:
+            self._counters[(name, labels)] = self._counters.get((name, labels), 0.0) + value
+
+    def set_gauge(self, name, labels, value):
+        with self._lock:
+            self._gauges[(name, labels)] = value
+
+    @staticmethod
+    def _labels(labels, extra=()):
+        pairs = list(labels) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{key}="{value}"' for key, value in pairs) + "}"
+
+    def render(self) -> str:
+        with self._lock:
+            histograms = {key: (list(h.counts), h.count, h.total) for key, h in self._histograms.items()}
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+        lines, typed = [], set()
+        for (name, labels), (counts, count, total) in sorted(histograms.items()):
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            for bound, bucket_count in zip(BUCKETS, counts):
+                lines.append(f"{name}_bucket{self._labels(labels, [('le', bound)])} {bucket_count}")
+            lines.append(f"{name}_bucket{self._labels(labels, [('le', '+Inf')])} {count}")
+            lines.append(f"{name}_sum{self._labels(labels)} {total:.6f}")
+            lines.append(f"{name}_count{self._labels(labels)} {count}")
+        for (name, labels), value in sorted(counters.items()):
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{self._labels(labels)} {round(value, 6)}")
+        for (name, labels), value in sorted(gauges.items()):
+            if name not in typed:
+                lines.append(f"# TYPE {name} gauge")
+                typed.add(name)
+            lines.append(f"{name}{self._labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+class Trace:
+    """Stage and external-call records of one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = []
+        self.current_stage = None
+
+    def summary(self) -> dict:
+        return {
+            "total_seconds": round(time.perf_counter() - self.started, 4),
+            "stages": self.stages,
+        }
+
+
+@contextmanager
+def request_trace():
+    """Collects the stages of the enclosed work into a Trace, yielded to the caller"""
+    trace = Trace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def record_stage(name, wall_seconds, cpu_seconds=None, error=False):
+    """Feeds one finished stage into the registry; for stages that cannot be wrapped in `stage()`"""
+    labels = (("stage", name),)
+    registry.observe("portfolio_stage_duration_seconds", labels, wall_seconds)
+    registry.increment("portfolio_stage_runs_total", labels)
+    if cpu_seconds is not None:
+        registry.increment("portfolio_stage_cpu_seconds_total", labels, cpu_seconds)
+    if error:
+        registry.increment("portfolio_stage_errors_total", labels)
+
+
+@contextmanager
+def stage(name):
+    """
+    Times one workflow stage. CPU time is that of the calling thread, so it is only meaningful
+    when the stage runs on one thread from start to end (not across generator yields).
+    """
+    trace = _current_trace.get()
+    entry = {"stage": name, "external_calls": {}}
+    if trace is not None:
+        outer_stage, trace.current_stage = trace.current_stage, entry
+    rss_before = _rss_bytes()
+    if TRACE_MEMORY:
+        allocated_before = tracemalloc.get_traced_memory()[0]
+    wall_start, cpu_start = time.perf_counter(), time.thread_time()
+    error = False
+    try:
+        yield entry
+    except BaseException:
+        error = True
+        raise
+    finally:
+        wall = time.perf_counter() - wall_start
+        cpu = time.thread_time() - cpu_start
+        record_stage(name, wall, cpu, error)
+        entry.update({"wall_seconds": round(wall, 4), "cpu_seconds": round(cpu, 4)})
+        rss_after = _rss_bytes()
+        if rss_before is not None and rss_after is not None:
+            entry["rss_delta_mb"] = round((rss_after - rss_before) / 2**20, 2)
+        if TRACE_MEMORY:
+            # Memory still allocated by the stage. The tracemalloc peak is not used: resetting it is
+            # process-wide and would clobber outer stages and concurrent requests. Allocations made by
+            # other threads meanwhile are still included.
+            entry["alloc_delta_mb"] = round((tracemalloc.get_traced_memory()[0] - allocated_before) / 2**20, 2)
+        if error:
+            entry["error"] = True
+        if trace is not None:
+            trace.current_stage = outer_stage
+            trace.stages.append(entry)
+
+
+@contextmanager
+def external_call(kind):
+    """Times one call to an external service and attributes it to the current stage"""
+    trace = _current_trace.get()
+    stage_entry = trace.current_stage if trace is not None else None
+    start = time.perf_counter()
+    error = False
+    try:
+        yield
+    except BaseException:
+        error = True
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        labels = (("kind", kind),)
+        registry.observe("portfolio_external_call_duration_seconds", labels, elapsed)
+        if error:
+            registry.increment("portfolio_external_call_errors_total", labels)
+        if stage_entry is not None:
+            calls = stage_entry["external_calls"].setdefault(kind, {"count": 0, "seconds": 0.0})
+            calls["count"] += 1
+            calls["seconds"] = round(calls["seconds"] + elapsed, 4)
+
+
+def render_prometheus() -> str:
+    rss = _rss_bytes()
+    text = registry.render()
+    if rss is not None:
+        text += f"# TYPE process_resident_memory_bytes gauge\nprocess_resident_memory_bytes {rss}\n"
+    return text
@@ -0,0 +1,99 @@
+import hashlib
+import os
+import random
+import time
+
+
+class LLMBackend:
+    """
+    Minimal interface the reporting agent needs from a text-generation model.
+    Implementations return the full text from `generate` and successive fragments from `stream`.
+    """
+
+    name = "base"
+    # The model behind the backend, if it has one; part of the report cache key
+    model_name = None
+
+    def generate(self, prompt: str) -> str:
+        return "".join(self.stream(prompt))
+
+    def stream(self, prompt: str):
+        raise NotImplementedError
+
+
+class GeminiBackend(LLMBackend):
+    """Google Gemini via google-generativeai. Requires GOOGLE_API_KEY."""
+
+    name = "gemini"
+
+    def __init__(self, model_name='gemini-1.5-flash-latest'):
+        import google.generativeai as genai
+
+        api_key = os.environ.get("GOOGLE_API_KEY")
+        if not api_key:
+            raise ValueError("GOOGLE_API_KEY not found. Please create a .env file with the key or set it as an environment variable.")
+        genai.configure(api_key=api_key)
+        self.model_name = model_name
+        self.model = genai.GenerativeModel(model_name)
+
+    def generate(self, prompt: str) -> str:
+        return self.model.generate_content(prompt).text
+
+    def stream(self, prompt: str):
+        for chunk in self.model.generate_content(prompt, stream=True):
+            # Chunks without text (e.g. safety metadata only) are skipped
+            if chunk.parts:
+                yield chunk.text
+
+
+class FakeLLMBackend(LLMBackend):
+    """
+    Deterministic, offline stand-in for benchmarking and load testing.
+
+    The output is a markdown report seeded by the prompt hash, so the same prompt always
+    produces the same text. `latency` is the time to first token in seconds and
+    `tokens_per_second` paces the remaining output; set either to 0 to disable waiting.
+    """
+
+    name = "fake"
+
+    _WORDS = ["portfolio", "allocation", "risk", "return", "diversified", "bonds", "equity",
+              "horizon", "goals", "volatility", "growth", "income", "rebalance", "long-term"]
+
+    def __init__(self, latency=0.5, tokens_per_second=50.0, output_tokens=300):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.output_tokens = output_tokens
+
+    def _tokens(self, prompt: str):
+        rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).hexdigest())
+        yield "# Portfolio Report\n\n## Summary\n\n"
+        for i in range(self.output_tokens):
+            word = rng.choice(self._WORDS)
+            yield f"{word}. " if i % 12 == 11 else f"{word} "
+
+    def stream(self, prompt: str):
+        if self.latency:
+            time.sleep(self.latency)
+        delay = 1.0 / self.tokens_per_second if self.tokens_per_second else 0
+        for token in self._tokens(prompt):
+            if delay:
+                time.sleep(delay)
+            yield token
+
+
+def get_llm_backend(model_name='gemini-1.5-flash-latest') -> LLMBackend:
+    """
+    Builds the backend selected by LLM_BACKEND ("gemini" by default, or "fake").
+    The fake backend reads FAKE_LLM_LATENCY, FAKE_LLM_TOKENS_PER_SEC and FAKE_LLM_OUTPUT_TOKENS.
+    """
+    backend = os.getenv("LLM_BACKEND", "gemini").lower()
+    if backend == "fake":
+        return FakeLLMBackend(
+            latency=float(os.getenv("FAKE_LLM_LATENCY", "0.5")),
+            tokens_per_second=float(os.getenv("FAKE_LLM_TOKENS_PER_SEC", "50")),
+            output_tokens=int(os.getenv("FAKE_LLM_OUTPUT_TOKENS", "300")),
+        )
+    if backend == "gemini":
+        return GeminiBackend(model_name)
+    raise ValueError(f"Unknown LLM_BACKEND '{backend}'. Expected 'gemini' or 'fake'.")
@@ -4,6 +4,7 @@ from dotenv import load_dotenv
 from datetime import datetime, timedelta
 import yfinance as yf # <-- Import yfinance
 import pandas as pd
+from portfolio_construction.instrumentation import external_call
 
 # Load API keys from the .env file
 load_dotenv()
@@ -40,7 +41,8 @@ class MarketResearchAgent:
             # We will calculate performance over the last month (approx 22 trading days)
             # yfinance is very flexible here, we'll use '1mo' period
             tickers = list(SECTOR_ETFS.values())
-            data = yf.download(tickers, period="1mo", progress=False)['Adj Close']
+            with external_call("yfinance"):
+                data = yf.download(tickers, period="1mo", progress=False)['Adj Close']
 
             if data.empty:
                 print("Warning: yfinance returned no data for sector ETFs.")
@@ -71,7 +73,8 @@ class MarketResearchAgent:
         # ... (This function remains unchanged)
         try:
             url = f"https://api.stlouisfed.org/fred/series/observations?series_id=FEDFUNDS&api_key={self.fred_key}&file_type=json&limit=2&sort_order=desc"
-            response = requests.get(url, timeout=10)
+            with external_call("fred"):
+                response = requests.get(url, timeout=10)
             response.raise_for_status()
             data = response.json()['observations']
             latest = float(data[0]['value']); previous = float(data[1]['value'])
@@ -91,7 +94,8 @@ class MarketResearchAgent:
                    f"&from={yesterday}&language=en"
                    f"&sources=bloomberg,the-wall-street-journal,reuters"
                    f"&apiKey={self.news_api_key}")
-            response = requests.get(url, timeout=10)
+            with external_call("newsapi"):
+                response = requests.get(url, timeout=10)
             response.raise_for_status()
             articles = response.json().get('articles', []); score = 0
             positive = ['optimism', 'growth', 'rally', 'upbeat', 'strong', 'gains']
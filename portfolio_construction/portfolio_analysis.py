@@ -3,6 +3,7 @@ import numpy as np
 import yfinance as yf
 import quantstats as qs  # <-- Import quantstats
 from datetime import datetime, timedelta
+from portfolio_construction.instrumentation import external_call
 
 class PortfolioAnalysisAgent:
     def __init__(self, portfolio: dict, investment_horizon_years=10, initial_capital=100000):
@@ -41,7 +42,8 @@ class PortfolioAnalysisAgent:
         start_date = end_date - timedelta(days=self.horizon_years * 365)
         try:
             # Using 'Close' is the modern standard for yfinance
-            data = yf.download(self.tickers, start=start_date, end=end_date)['Close']
+            with external_call("yfinance"):
+                data = yf.download(self.tickers, start=start_date, end=end_date)['Close']
             self.historical_data = data.dropna()
             print("Data fetched successfully.")
         except Exception as e:
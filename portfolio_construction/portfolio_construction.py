@@ -2,6 +2,7 @@ import pandas as pd
 import yfinance as yf
 from pypfopt import EfficientFrontier, risk_models, expected_returns
 from pypfopt.exceptions import OptimizationError
+from portfolio_construction.instrumentation import external_call
 
 class PortfolioConstructionAgent:
     def __init__(self, client_profile: dict):
@@ -58,7 +59,8 @@ class PortfolioConstructionAgent:
             # Fetch 5 years of historical data
             # NEW, FIXED LINE
             # NEW, FIXED LINE
-            prices = yf.download(self.asset_universe, period="5y")['Close'].dropna()
+            with external_call("yfinance"):
+                prices = yf.download(self.asset_universe, period="5y")['Close'].dropna()
 
             # Calculate expected returns and sample covariance matrix
             # mu is the annualized sample return, S is the sample covariance matrix
@@ -0,0 +1,117 @@
+import json
+import math
+import re
+
+# Rough characters-per-token ratio for English/JSON text on Gemini-class tokenizers
+CHARS_PER_TOKEN = 4
+
+_MONEY_WITH_CENTS = re.compile(r"^\$[\d,]+\.\d{2}$")
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximates the token count of `text` without calling the model's tokenizer."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def round_value(value):
+    """
+    Rounds floats to 4 decimal places and `$` amounts with cents to whole dollars (`$1,234`);
+    recurses into lists and dicts. report_cache relies on this exact output for its display values.
+    """
+    if isinstance(value, float):
+        return round(value, 4)
+    if isinstance(value, str):
+        if _MONEY_WITH_CENTS.match(value):
+            return f"${round(float(value[1:].replace(',', ''))):,}"
+        return value
+    if isinstance(value, dict):
+        return {k: round_value(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [round_value(v) for v in value]
+    return value
+
+
+def serialize(data) -> str:
+    """Canonical, whitespace-free JSON with sorted keys and rounded numerics."""
+    return json.dumps(round_value(data), sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+# --- Minimal schemas for each agent's output ---
+def compact_profile(client_profile: dict) -> dict:
+    """Keeps what the report discusses; the id and raw sentiment string are redundant with the risk score."""
+    return {
+        "risk": client_profile.get("riskProfile"),
+        "riskScore": client_profile.get("riskScore"),
+        "horizonYears": client_profile.get("investmentHorizon"),
+        "goals": client_profile.get("goals", []),
+        "constraints": client_profile.get("constraints", []),
+    }
+
+
+def compact_portfolio(constructed_portfolio: dict) -> dict:
+    """Holdings become a ticker -> percent map; the generated portfolio name is dropped."""
+    if "error" in constructed_portfolio:
+        return {"error": constructed_portfolio["error"]}
+    return {
+        "allocation": constructed_portfolio.get("assetAllocation", {}),
+        "holdingsPct": {
+            h["ticker"]: round(h["percentage"] * 100, 1) for h in constructed_portfolio.get("holdings", [])
+        },
+        "rationale": constructed_portfolio.get("rationale"),
+    }
+
+
+def compact_analysis(portfolio_analysis: dict) -> dict:
+    """Drops the repeated weights and simulation bookkeeping, keeping metrics, outcome percentiles and warnings."""
+    if "error" in portfolio_analysis:
+        return {"error": portfolio_analysis["error"]}
+    forecast = portfolio_analysis.get("monte_carlo_forecast", {})
+    return {
+        "backtest": portfolio_analysis.get("backtest_results", {}),
+        "forecast": {
+            "years": forecast.get("horizon_years"),
+            "p10": forecast.get("10th_percentile_outcome"),
+            "p50": forecast.get("50th_percentile_outcome (Median)"),
+            "p90": forecast.get("90th_percentile_outcome"),
+        },
+        "warnings": portfolio_analysis.get("risk_warnings", []),
+    }
+
+
+PROMPT_TEMPLATE = """Role: expert financial analyst and communicator. Write a personalized portfolio report.
+Audience: {target_audience}. Format: {report_format}. Tone: {tone}.
+For 'client': plain language, no jargon, tie the portfolio to their goals, reassuring but realistic.
+For 'financial_advisor': technical terms (Sharpe, VaR) are fine; focus on metrics, risk and rebalancing.
+Inputs are compact JSON. Percentages in holdingsPct are of total portfolio value; forecast p10/p50/p90 are outcome percentiles in USD.
+PROFILE: {profile}
+PORTFOLIO: {portfolio}
+ANALYSIS: {analysis}
+Output: start with a summary, then detail the portfolio, analyze performance against the client's goals, and end with next steps. For markdown use headings, bullets and bold text."""
+
+
+def build_report_prompt(client_profile, constructed_portfolio, portfolio_analysis, customization_options):
+    """
+    Builds the compact reporting prompt.
+
+    Returns:
+        tuple: (prompt, section_tokens) where section_tokens maps each section
+        ("instructions", "profile", "portfolio", "analysis", "total") to its estimated token count.
+    """
+    sections = {
+        "profile": serialize(compact_profile(client_profile)),
+        "portfolio": serialize(compact_portfolio(constructed_portfolio)),
+        "analysis": serialize(compact_analysis(portfolio_analysis)),
+    }
+    prompt = PROMPT_TEMPLATE.format(
+        target_audience=customization_options.get('target_audience', 'client'),
+        report_format=customization_options.get('report_format', 'markdown'),
+        tone=customization_options.get('tone', 'professional and encouraging'),
+        **sections,
+    )
+
+    section_tokens = {name: estimate_tokens(text) for name, text in sections.items()}
+    section_tokens["total"] = estimate_tokens(prompt)
+    section_tokens["instructions"] = section_tokens["total"] - sum(
+        section_tokens[name] for name in sections
+    )
+    return prompt, section_tokens
@@ -0,0 +1,192 @@
+import os
+import re
+from portfolio_construction.cache import LRUCache, content_hash
+from portfolio_construction.prompt_builder import round_value
+
+# Bump whenever the report prompt or the stored display values change so stale cached reports are not reused
+REPORT_CACHE_VERSION = "3"
+
+# Holding weights are bucketed to this step for near-identical matching
+WEIGHT_BUCKET = 0.05
+
+# Fields that identify the client or request rather than describe the portfolio
+_IDENTITY_FIELDS = {"clientId", "portfolioName"}
+
+
+def _exact_inputs(client_profile, constructed_portfolio, portfolio_analysis, customization_options):
+    """Everything the prompt depends on, minus identity fields that only get echoed back."""
+    return {
+        "profile": {k: v for k, v in client_profile.items() if k not in _IDENTITY_FIELDS},
+        "portfolio": {k: v for k, v in constructed_portfolio.items() if k not in _IDENTITY_FIELDS},
+        "analysis": portfolio_analysis,
+        "options": customization_options,
+    }
+
+
+def _near_analysis(portfolio_analysis):
+    """
+    The analysis fields a templated report cannot rewrite: everything except the quoted metric strings
+    (which `_display_values` tracks) and the weights (already bucketed from the portfolio).
+    """
+    analysis = {k: v for k, v in portfolio_analysis.items() if k != "portfolio"}
+    for section in ("backtest_results", "monte_carlo_forecast"):
+        if isinstance(analysis.get(section), dict):
+            analysis[section] = {name: value for name, value in analysis[section].items() if not isinstance(value, str)}
+    return analysis
+
+
+def _near_inputs(client_profile, constructed_portfolio, portfolio_analysis, customization_options):
+    """
+    The coarse shape of a report: risk bucket, goals, constraints, horizon, bucketed ETF weights and
+    the untracked analysis fields (warnings, simulation settings).
+    Two requests with the same near inputs produce reports that differ only in their numbers.
+    """
+    weights = {
+        h["ticker"]: round(round(h["percentage"] / WEIGHT_BUCKET) * WEIGHT_BUCKET, 2)
+        for h in constructed_portfolio.get("holdings", [])
+    }
+    return {
+        "riskProfile": client_profile.get("riskProfile"),
+        "goals": sorted(client_profile.get("goals", [])),
+        "constraints": sorted(client_profile.get("constraints", [])),
+        "investmentHorizon": client_profile.get("investmentHorizon"),
+        "weights": weights,
+        "analysis": _near_analysis(portfolio_analysis),
+        "options": customization_options,
+    }
+
+
+def _display_values(client_profile, constructed_portfolio, portfolio_analysis):
+    """
+    Collects the values a report is likely to quote verbatim, keyed by a stable path.
+    These are substituted when a near-identical cached report is reused.
+    Values the compact prompt rounds (dollar amounts, floats) are recorded both as given and in the
+    rounded form the model actually sees, since the report quotes whichever its prompt contained.
+    """
+    values = {
+        "clientId": str(client_profile.get("clientId", "")),
+        "portfolioName": str(constructed_portfolio.get("portfolioName", "")),
+        "riskScore": str(client_profile.get("riskScore", "")),
+        "riskScore.compact": str(round_value(client_profile.get("riskScore", ""))),
+    }
+    for asset_class, pct in constructed_portfolio.get("assetAllocation", {}).items():
+        values[f"allocation.{asset_class}"] = str(pct)
+    for holding in constructed_portfolio.get("holdings", []):
+        values[f"weight2.{holding['ticker']}"] = f"{holding['percentage']:.2%}"
+        values[f"weight1.{holding['ticker']}"] = f"{holding['percentage']:.1%}"
+    for section in ("backtest_results", "monte_carlo_forecast"):
+        for name, value in portfolio_analysis.get(section, {}).items():
+            if isinstance(value, str):
+                values[f"{section}.{name}"] = value
+                values[f"{section}.{name}.compact"] = round_value(value)
+    return {path: value for path, value in values.items() if value}
+
+
+def _value_pattern(value):
+    """
+    Matches `value` only as a whole figure or word, so "5.0%" does not match inside "15.0%",
+    "5.5" inside "5.55", or a client id "A" inside "CAGR".
+    """
+    return rf"(?<![\w.,]){re.escape(value)}(?!\w|[.,]\d)"
+
+
+def _fill_in(report, old_values, new_values):
+    """
+    Rewrites the quoted values of a cached report with the values of the new request.
+    Returns None if a changed value cannot be substituted unambiguously.
+    """
+    replacements = {}
+    for path, new_value in new_values.items():
+        old_value = old_values.get(path)
+        if old_value is None or old_value == new_value:
+            continue
+        if replacements.get(old_value, new_value) != new_value:
+            # The same old text maps to two different new values; we cannot tell which is which
+            return None
+        replacements[old_value] = new_value
+
+    # Values that did not change must not be rewritten by a change elsewhere
+    for path, new_value in new_values.items():
+        if old_values.get(path) == new_value and new_value in replacements:
+            return None
+
+    if not replacements:
+        return report
+    identities = {old_values.get(field) for field in _IDENTITY_FIELDS}
+    for old_value in replacements:
+        if old_value not in identities and len(re.findall(_value_pattern(old_value), report)) > 1:
+            # A figure quoted more than once may also be a different metric that happens to match
+            return None
+    # A single alternation pass avoids rewriting text that an earlier replacement produced
+    pattern = re.compile("|".join(_value_pattern(old) for old in sorted(replacements, key=len, reverse=True)))
+    return pattern.sub(lambda m: replacements[m.group(0)], report)
+
+
+class ReportCache:
+    """
+    Caches generated reports keyed on a canonical hash of the reporting inputs.
+
+    Both keys also include `generator`, which describes what produced the report (LLM backend,
+    model, prompt style), so reports are never shared between differently configured agents.
+    An exact hit requires identical profile, portfolio, analysis and customization options
+    (ignoring the client id and portfolio name). With `near_match` enabled, a request whose
+    risk bucket, goals, constraints, horizon, bucketed ETF weights and non-quoted analysis fields
+    match a cached report reuses that report with its quoted numbers replaced by the new ones,
+    provided each changed number appears exactly once as a whole figure; otherwise it is a miss.
+    """
+
+    def __init__(self, max_entries=256, disk_dir=None, near_match=False):
+        self.exact = LRUCache(max_entries=max_entries, disk_dir=disk_dir)
+        self.near = LRUCache(max_entries=max_entries,
+                             disk_dir=os.path.join(disk_dir, "near") if disk_dir else None)
+        self.near_match = near_match
+
+    def get(self, client_profile, constructed_portfolio, portfolio_analysis, customization_options, generator=None):
+        """Returns a cached (or templated) report for these inputs, or None on a miss."""
+        exact_key = content_hash(REPORT_CACHE_VERSION, generator, _exact_inputs(
+            client_profile, constructed_portfolio, portfolio_analysis, customization_options))
+        entry = self.exact.get(exact_key)
+        new_values = _display_values(client_profile, constructed_portfolio, portfolio_analysis)
+        if entry is not None:
+            return _fill_in(entry["report"], entry["values"], new_values)
+
+        if not self.near_match:
+            return None
+        near_key = content_hash(REPORT_CACHE_VERSION, generator, _near_inputs(
+            client_profile, constructed_portfolio, portfolio_analysis, customization_options))
+        entry = self.near.get(near_key)
+        if entry is None:
+            return None
+        return _fill_in(entry["report"], entry["values"], new_values)
+
+    def set(self, client_profile, constructed_portfolio, portfolio_analysis, customization_options, report,
+            generator=None):
+        """Stores a freshly generated report under both its exact and near keys."""
+        entry = {
+            "report": report,
+            "values": _display_values(client_profile, constructed_portfolio, portfolio_analysis),
+        }
+        self.exact.set(content_hash(REPORT_CACHE_VERSION, generator, _exact_inputs(
+            client_profile, constructed_portfolio, portfolio_analysis, customization_options)), entry)
+        self.near.set(content_hash(REPORT_CACHE_VERSION, generator, _near_inputs(
+            client_profile, constructed_portfolio, portfolio_analysis, customization_options)), entry)
+
+    def stats(self):
+        return {"exact": self.exact.stats(), "near": self.near.stats(), "near_match": self.near_match}
+
+
+_report_cache = None
+
+def get_report_cache():
+    """
+    Returns the shared report cache, creating it on first use.
+    Configured via REPORT_CACHE_SIZE, REPORT_CACHE_DIR and REPORT_CACHE_NEAR_MATCH (1 to enable templating).
+    """
+    global _report_cache
+    if _report_cache is None:
+        _report_cache = ReportCache(
+            max_entries=int(os.getenv("REPORT_CACHE_SIZE", "256")),
+            disk_dir=os.getenv("REPORT_CACHE_DIR") or None,
+            near_match=os.getenv("REPORT_CACHE_NEAR_MATCH", "0") == "1",
+        )
+    return _report_cache
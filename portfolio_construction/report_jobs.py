@@ -0,0 +1,232 @@
+import ipaddress
+import os
+import requests
+import socket
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+from portfolio_construction.cache import content_hash, normalize_text
+from portfolio_construction.instrumentation import registry
+
+# How long a caller should wait before re-submitting after a 429
+RETRY_AFTER_SECONDS = 5
+WEBHOOK_TIMEOUT_SECONDS = 10
+# Comma-separated host names callbacks may target (a name also allows its subdomains). When unset,
+# any host is accepted as long as it resolves only to public addresses.
+WEBHOOK_ALLOWED_HOSTS = [h.strip().lower() for h in os.getenv("REPORT_JOB_WEBHOOK_HOSTS", "").split(",") if h.strip()]
+
+
+def validate_callback_url(url):
+    """
+    Raises ValueError unless `url` is an http(s) URL the server may POST to: a host on the
+    allow-list, or (without one) a host that resolves only to public addresses, which keeps
+    callbacks away from loopback, private networks and cloud metadata endpoints.
+    """
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    if parts.scheme not in ("http", "https") or not host:
+        raise ValueError("callback_url must be an http(s) URL with a host")
+    if WEBHOOK_ALLOWED_HOSTS:
+        if not any(host == allowed or host.endswith("." + allowed) for allowed in WEBHOOK_ALLOWED_HOSTS):
+            raise ValueError(f"callback_url host '{host}' is not in REPORT_JOB_WEBHOOK_HOSTS")
+        return
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, parts.port or 443, proto=socket.IPPROTO_TCP)}
+    except (socket.gaierror, ValueError) as e:
+        raise ValueError(f"callback_url host '{host}' does not resolve: {e}")
+    for address in addresses:
+        if not ipaddress.ip_address(address.split("%")[0]).is_global:
+            raise ValueError(f"callback_url host '{host}' resolves to a non-public address")
+
+
+class JobQueueFull(Exception):
+    """Raised by `submit` when every worker is busy and the wait queue is at capacity."""
+
+
+class ReportJob:
+    def __init__(self, client_id, message, callback_url=None):
+        self.id = uuid.uuid4().hex
+        self.client_id = client_id
+        self.message = message
+        self.callback_url = callback_url
+        self.dedupe_key = content_hash(client_id, normalize_text(message))
+        self.status = "queued"
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.webhook_status = None
+
+    def to_dict(self) -> dict:
+        job = {
+            "job_id": self.id,
+            "client_id": self.client_id,
+            "status": self.status,
+            "submitted_at": self.submitted_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.status == "done":
+            job["result"] = self.result
+        if self.status == "failed":
+            job["error"] = self.error
+        if self.callback_url:
+            job["webhook_status"] = self.webhook_status
+        return job
+
+
+class ReportJobQueue:
+    """
+    Runs report jobs on a bounded thread pool so slow reports never hold an HTTP connection.
+
+    - At most `max_workers` jobs run at once and at most `max_queued` wait; beyond that `submit`
+      raises JobQueueFull, which the API turns into a 429 so callers back off instead of piling up.
+    - A job submitted while an identical one (same client id and conversation text) is queued
+      or running gets the existing job back instead of a new one.
+    - Finished jobs stay pollable for `result_ttl` seconds, up to `max_finished` of them.
+    - If a job carries a callback URL, its final state is POSTed there when it finishes, from a
+      separate small pool so slow receivers never hold a report worker.
+
+    `handler(client_id, message)` does the work and returns the JSON-serializable result.
+    """
+
+    def __init__(self, handler, max_workers=4, max_queued=32, result_ttl=3600.0, max_finished=1000,
+                 webhook_workers=2):
+        self.handler = handler
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.result_ttl = result_ttl
+        self.max_finished = max_finished
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="report-job")
+        self._webhooks = ThreadPoolExecutor(max_workers=webhook_workers, thread_name_prefix="report-webhook")
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._in_flight = {}
+        self._queued = 0
+        self._running = 0
+
+    @classmethod
+    def from_env(cls, handler):
+        return cls(
+            handler,
+            max_workers=int(os.getenv("REPORT_JOB_WORKERS", "4")),
+            max_queued=int(os.getenv("REPORT_JOB_QUEUE_SIZE", "32")),
+            result_ttl=float(os.getenv("REPORT_JOB_RESULT_TTL", "3600")),
+            max_finished=int(os.getenv("REPORT_JOB_HISTORY", "1000")),
+            webhook_workers=int(os.getenv("REPORT_JOB_WEBHOOK_WORKERS", "2")),
+        )
+
+    def _publish_depth(self):
+        # Called with the lock held
+        registry.set_gauge("portfolio_report_jobs_queued", (), self._queued)
+        registry.set_gauge("portfolio_report_jobs_running", (), self._running)
+
+    def _expire(self, now):
+        """Forgets finished jobs past their TTL, oldest first. Called with the lock held."""
+        finished = [job for job in self._jobs.values() if job.finished_at is not None]
+        excess = len(finished) - self.max_finished
+        for job in finished:
+            if excess <= 0 and now - job.finished_at < self.result_ttl:
+                break
+            del self._jobs[job.id]
+            excess -= 1
+
+    def submit(self, client_id, message, callback_url=None):
+        """
+        Returns (job, created); created is False when an identical in-flight job was reused.
+        Raises ValueError for a callback URL that fails `validate_callback_url`.
+        """
+        if callback_url:
+            validate_callback_url(callback_url)
+        job = ReportJob(client_id, message, callback_url)
+        with self._lock:
+            existing = self._in_flight.get(job.dedupe_key)
+            if existing is not None:
+                registry.increment("portfolio_report_jobs_total", (("outcome", "deduplicated"),))
+                return existing, False
+            if self._running + self._queued >= self.max_workers + self.max_queued:
+                registry.increment("portfolio_report_jobs_total", (("outcome", "rejected"),))
+                raise JobQueueFull(f"{self._running} report jobs running and {self._queued} queued")
+            self._expire(time.time())
+            self._jobs[job.id] = job
+            self._in_flight[job.dedupe_key] = job
+            self._queued += 1
+            self._publish_depth()
+        registry.increment("portfolio_report_jobs_total", (("outcome", "accepted"),))
+        self._pool.submit(self._run, job)
+        return job, True
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def describe(self, job) -> dict:
+        """`job.to_dict()` taken under the lock, so status, result and webhook status are consistent"""
+        with self._lock:
+            return job.to_dict()
+
+    def _run(self, job):
+        with self._lock:
+            if job.status != "queued":
+                # Failed by shutdown() before this worker picked it up
+                return
+            self._queued -= 1
+            self._running += 1
+            job.status, job.started_at = "running", time.time()
+            self._publish_depth()
+        registry.observe("portfolio_report_job_wait_seconds", (), job.started_at - job.submitted_at)
+        try:
+            result, status, error = self.handler(job.client_id, job.message), "done", None
+        except Exception as e:
+            result, status, error = None, "failed", str(e)
+        with self._lock:
+            self._running -= 1
+            job.result, job.error = result, error
+            job.status, job.finished_at = status, time.time()
+            self._in_flight.pop(job.dedupe_key, None)
+            self._publish_depth()
+        registry.observe("portfolio_report_job_run_seconds", (("status", status),), job.finished_at - job.started_at)
+        if job.callback_url:
+            self._webhooks.submit(self._notify, job)
+
+    def _notify(self, job):
+        """POSTs the finished job to its callback URL; failures are recorded on the job, not retried."""
+        try:
+            # Checked again at send time, as the name may resolve differently by now; redirects are not
+            # followed since they could point anywhere
+            validate_callback_url(job.callback_url)
+            response = requests.post(job.callback_url, json=self.describe(job), timeout=WEBHOOK_TIMEOUT_SECONDS,
+                                     allow_redirects=False)
+            webhook_status = response.status_code
+        except Exception as e:
+            webhook_status = f"error: {e}"
+            registry.increment("portfolio_report_job_webhook_errors_total", ())
+        with self._lock:
+            job.webhook_status = webhook_status
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "max_queued": self.max_queued,
+                "queued": self._queued,
+                "running": self._running,
+                "tracked_jobs": len(self._jobs),
+            }
+
+    def shutdown(self):
+        """Stops the pools; jobs that never started are marked failed rather than left queued forever."""
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._webhooks.shutdown(wait=False, cancel_futures=True)
+        now = time.time()
+        with self._lock:
+            for job in self._jobs.values():
+                if job.status == "queued":
+                    job.status, job.error, job.finished_at = "failed", "cancelled: server shutting down", now
+                    self._in_flight.pop(job.dedupe_key, None)
+                    self._queued -= 1
+            self._publish_depth()
@@ -1,7 +1,9 @@
 import os, json
-import google.generativeai as genai
-from IPython.display import display, Markdown
 from dotenv import load_dotenv  # NEW: Import the load_dotenv function
+from portfolio_construction.report_cache import get_report_cache
+from portfolio_construction.prompt_builder import build_report_prompt, estimate_tokens
+from portfolio_construction.llm_backends import get_llm_backend
+from portfolio_construction.instrumentation import external_call
 
 # --- Configuration ---
 
@@ -9,19 +11,8 @@ from dotenv import load_dotenv  # NEW: Import the load_dotenv function
 # This should be at the top of your script, before you access any variables.
 load_dotenv()
 
-try:
-    # MODIFIED: The code now primarily relies on the .env file or a system environment variable.
-    GOOGLE_API_KEY = os.environ.get("GOOGLE_API_KEY")
-    if not GOOGLE_API_KEY:
-        # MODIFIED: Updated error message to be more specific.
-        raise ValueError("GOOGLE_API_KEY not found. Please create a .env file with the key or set it as an environment variable.")
-
-    genai.configure(api_key=GOOGLE_API_KEY)
-except Exception as e:
-    print(f"Error configuring Gemini: {e}")
-    print("Please ensure you have a valid Gemini API key configured in your .env file.")
-    # Exit or handle the lack of API key appropriately
-    exit()
+# The LLM is configured per agent through llm_backends.get_llm_backend (LLM_BACKEND=gemini|fake),
+# so a missing GOOGLE_API_KEY no longer terminates the process at import time.
 
 
 class ReportingAndCustomizationAgent:
@@ -33,24 +24,39 @@ class ReportingAndCustomizationAgent:
     and formats.
     """
 
-    def __init__(self, model_name='gemini-1.5-flash-latest'):
+    def __init__(self, model_name='gemini-1.5-flash-latest', use_cache=True, compact_prompt=True, backend=None):
         """
         Initializes the agent and the generative model.
 
         Args:
             model_name (str): The name of the Gemini model to use.
+            use_cache (bool): Serve repeated or near-identical requests from the shared report cache.
+            compact_prompt (bool): Serialize inputs with the compact prompt builder instead of raw dict reprs.
+            backend (LLMBackend): Explicit LLM backend; defaults to the one selected by LLM_BACKEND.
         """
+        self.cache = get_report_cache() if use_cache else None
+        self.compact_prompt = compact_prompt
+        self.last_prompt_tokens = {}
         try:
-            self.model = genai.GenerativeModel(model_name)
-            print(f"ReportingAndCustomizationAgent initialized with model: {model_name}")
+            self.backend = backend or get_llm_backend(model_name)
+            print(f"ReportingAndCustomizationAgent initialized with {self.backend.name} backend, model: {model_name}")
         except Exception as e:
             print(f"Error initializing generative model: {e}")
-            self.model = None
+            print("Please ensure you have a valid Gemini API key configured in your .env file, or set LLM_BACKEND=fake.")
+            self.backend = None
 
     def _create_prompt(self, client_profile, constructed_portfolio, portfolio_analysis, customization_options):
         """
         Builds a detailed, structured prompt for the Gemini model.
+        Estimated token counts per section are stored in `self.last_prompt_tokens`.
         """
+        if self.compact_prompt:
+            prompt, self.last_prompt_tokens = build_report_prompt(
+                client_profile, constructed_portfolio, portfolio_analysis, customization_options
+            )
+            print(f"Prompt tokens (estimated): {self.last_prompt_tokens}")
+            return prompt
+
         # Unpack customization options with defaults
         target_audience = customization_options.get('target_audience', 'client')
         report_format = customization_options.get('report_format', 'markdown')
@@ -87,11 +93,17 @@ class ReportingAndCustomizationAgent:
         Ensure the structure is logical and easy to follow. For a markdown report, use headings, bullet points, and bold text to improve readability.
         Start with a summary, then detail the portfolio, analyze its performance in relation to the client's goals, and conclude with next steps or recommendations.
         """
-        return prompt.strip()
+        prompt = prompt.strip()
+        self.last_prompt_tokens = {"total": estimate_tokens(prompt)}
+        return prompt
+
+    def _cache_scope(self):
+        """What besides the inputs shapes a report: the backend, its model and the prompt style"""
+        return {"backend": self.backend.name, "model": self.backend.model_name, "compact_prompt": self.compact_prompt}
 
     def generate_report(self, client_profile, constructed_portfolio, portfolio_analysis, customization_options):
         """
-        Generates the report by calling the Gemini API.
+        Generates the report by calling the configured LLM backend.
 
         Args:
             client_profile (dict): Output from ClientProfilerAgent.
@@ -102,9 +114,16 @@ class ReportingAndCustomizationAgent:
         Returns:
             str: The generated report as a string.
         """
-        if not self.model:
+        if not self.backend:
             return "Error: Generative model is not initialized. Cannot generate report."
 
+        if self.cache:
+            cached_report = self.cache.get(client_profile, constructed_portfolio, portfolio_analysis, customization_options,
+                                           generator=self._cache_scope())
+            if cached_report is not None:
+                print("\n--- Report served from cache ---")
+                return cached_report
+
         try:
             prompt = self._create_prompt(
                 client_profile,
@@ -114,13 +133,63 @@ class ReportingAndCustomizationAgent:
             )
 
             print("\n--- Generating Report... ---")
-            response = self.model.generate_content(prompt)
+            with external_call(f"llm_{self.backend.name}"):
+                report = self.backend.generate(prompt)
 
-            return response.text
+            if self.cache:
+                self.cache.set(client_profile, constructed_portfolio, portfolio_analysis, customization_options, report,
+                               generator=self._cache_scope())
+            return report
 
         except Exception as e:
             return f"An error occurred while generating the report: {e}"
 
+    def generate_report_stream(self, client_profile, constructed_portfolio, portfolio_analysis, customization_options):
+        """
+        Streaming variant of `generate_report`.
+
+        Yields the report text in chunks as the LLM backend produces them, so callers can
+        start rendering before the full report is complete. Takes the same arguments as
+        `generate_report`.
+
+        Yields:
+            str: Consecutive fragments of the report.
+        """
+        if not self.backend:
+            yield "Error: Generative model is not initialized. Cannot generate report."
+            return
+
+        if self.cache:
+            cached_report = self.cache.get(client_profile, constructed_portfolio, portfolio_analysis, customization_options,
+                                           generator=self._cache_scope())
+            if cached_report is not None:
+                print("\n--- Report served from cache ---")
+                yield cached_report
+                return
+
+        try:
+            prompt = self._create_prompt(
+                client_profile,
+                constructed_portfolio,
+                portfolio_analysis,
+                customization_options
+            )
+
+            print("\n--- Streaming Report... ---")
+            chunks = []
+            # Spans the yields, so this includes the time the consumer takes per chunk
+            with external_call(f"llm_{self.backend.name}_stream"):
+                for chunk in self.backend.stream(prompt):
+                    chunks.append(chunk)
+                    yield chunk
+
+            if self.cache:
+                self.cache.set(client_profile, constructed_portfolio, portfolio_analysis, customization_options, "".join(chunks),
+                               generator=self._cache_scope())
+
+        except Exception as e:
+            yield f"An error occurred while generating the report: {e}"
+
 # --- Main Execution Block (To demonstrate the agent) ---
 if __name__ == "__main__":
     with open("conservative_profile.json", "r", encoding="utf-8") as f:
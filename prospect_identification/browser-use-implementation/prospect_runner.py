@@ -0,0 +1,255 @@
+"""
+Runs many LinkedIn prospecting agents concurrently.
+
+Every (search phrase, region) pair becomes one browser-use Agent task. At most --agents tasks
+run at once, each in its own copy of the base browser profile (Chromium locks a profile
+directory, so agents cannot share one), which keeps the LinkedIn login of the base profile.
+
+Output goes to --out (default runs/latest):
+- prospects.ndjson  one prospect per line, appended as soon as an agent extracts it, deduplicated
+                    by name and company across all tasks
+- raw/<task>.json   the agent's extracted content, in the same shape as result.json
+- state.json        per-task status, checkpointed after every step and task
+
+Re-running with the same --out resumes: finished tasks are skipped and known prospects are not
+written again. --retry-failed also reruns tasks that failed.
+
+Usage:
+    python prospect_runner.py --phrases phrases.txt --regions India,Singapore --agents 3 --per-task 10
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+
+from browser_use import Agent, BrowserProfile
+from langchain_google_genai import ChatGoogleGenerativeAI
+
+from dotenv import load_dotenv
+load_dotenv()
+
+# Logged-in profile that worker profiles are copied from
+BASE_PROFILE_DIR = os.getenv("BROWSER_USER_DATA_DIR", r'C:\Users\Lenovo\AppData\Local\Chromium\User Data')
+LLM_MODEL = os.getenv("PROSPECT_LLM_MODEL", "gemini-2.5-flash-preview-05-20")
+
+DEFAULT_PHRASES = [
+    "I am happy to announce that I am joining",
+    "I am happy to share that I am starting a new position as",
+]
+
+TASK_TEMPLATE = """Go to www.linkedin.com, Search for the posts where some users have posted about their recent promotions
+                or new jobs at a company in {region}. Search for the phrase '{phrase}'. Go to that user's profile and
+                Collect the names and details of these users in a JSON like this
+                {{
+                    "name": "John Doe",
+                    "job_title": "Software Engineer",
+                    "company": "Tech Company",
+                    "location": "{region}",
+                }}.
+                Output each user's JSON as soon as you have collected it.
+                Stop when you have got {target} users in a json that match the criteria."""
+
+_JSON_OBJECT = re.compile(r"\{[^{}]*\}")
+
+
+def task_id(phrase: str, region: str) -> str:
+    return hashlib.sha1(f"{phrase}|{region}".encode("utf-8")).hexdigest()[:12]
+
+
+def prospect_key(prospect: dict):
+    return (prospect["name"].strip().lower(), str(prospect.get("company") or "").strip().lower())
+
+
+def parse_prospects(content) -> list:
+    """Pulls prospect objects out of an agent's extracted content (JSON text, possibly inside prose)"""
+    prospects = []
+    for item in content if isinstance(content, list) else [content]:
+        for match in _JSON_OBJECT.finditer(str(item or "")):
+            try:
+                # Agents often leave a trailing comma, as in the example they are given
+                candidate = json.loads(re.sub(r",\s*}", "}", match.group(0)))
+            except ValueError:
+                continue
+            if isinstance(candidate, dict) and str(candidate.get("name") or "").strip():
+                prospects.append(candidate)
+    return prospects
+
+
+class ProspectRunner:
+    def __init__(self, out_dir, tasks, agents=2, per_task=10, max_steps=60, retry_failed=False):
+        self.out_dir = out_dir
+        self.agents = agents
+        self.per_task = per_task
+        self.max_steps = max_steps
+        self.state_path = os.path.join(out_dir, "state.json")
+        self.prospects_path = os.path.join(out_dir, "prospects.ndjson")
+        os.makedirs(os.path.join(out_dir, "raw"), exist_ok=True)
+        os.makedirs(os.path.join(out_dir, "profiles"), exist_ok=True)
+
+        self.state = self._load_state()
+        for phrase, region in tasks:
+            entry = self.state["tasks"].setdefault(task_id(phrase, region), {
+                "phrase": phrase, "region": region, "status": "pending", "prospects": 0, "error": None,
+            })
+            if entry["status"] == "running" or (retry_failed and entry["status"] == "failed"):
+                # Interrupted mid-run, or a failure we were asked to retry
+                entry["status"] = "pending"
+        self.seen = self._load_seen()
+        self._prospects_file = None
+
+    # --- Persistence ---
+    def _load_state(self):
+        try:
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"tasks": {}, "startedAt": time.time()}
+
+    def _checkpoint(self):
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def _load_seen(self):
+        seen = set()
+        try:
+            with open(self.prospects_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        seen.add(prospect_key(json.loads(line)))
+                    except (ValueError, KeyError):
+                        # A torn last line from an interrupted run
+                        continue
+        except FileNotFoundError:
+            pass
+        return seen
+
+    def _record(self, tid, prospects) -> int:
+        """Appends prospects not seen before; returns how many were new"""
+        new = 0
+        for prospect in prospects:
+            key = prospect_key(prospect)
+            if key in self.seen:
+                continue
+            self.seen.add(key)
+            self._prospects_file.write(json.dumps({**prospect, "task": tid}, ensure_ascii=False) + "\n")
+            new += 1
+        if new:
+            self._prospects_file.flush()
+        return new
+
+    # --- Browser profiles ---
+    async def _worker_profile(self, slot: int) -> BrowserProfile:
+        """A private copy of the base profile per worker slot, made once and reused across tasks"""
+        profile_dir = os.path.join(self.out_dir, "profiles", f"worker-{slot}")
+        if not os.path.exists(profile_dir) and os.path.isdir(BASE_PROFILE_DIR):
+            # Profiles can be gigabytes: copy in a thread so the other agents keep running meanwhile
+            await asyncio.to_thread(
+                shutil.copytree, BASE_PROFILE_DIR, profile_dir,
+                ignore=shutil.ignore_patterns("Singleton*", "*.lock", "Cache", "Code Cache", "GPUCache"),
+            )
+        return BrowserProfile(user_data_dir=profile_dir)
+
+    # --- Execution ---
+    async def _run_task(self, tid, entry, profile):
+        entry["status"] = "running"
+        self._checkpoint()
+
+        processed_steps = 0
+
+        async def on_step_end(agent):
+            # Stream prospects out as soon as the agent extracts them; only steps not seen yet are parsed
+            nonlocal processed_steps
+            steps = agent.state.history.history
+            content = [result.extracted_content for step in steps[processed_steps:]
+                       for result in step.result if result.extracted_content]
+            processed_steps = len(steps)
+            new = self._record(tid, parse_prospects(content))
+            if new:
+                entry["prospects"] += new
+                self._checkpoint()
+
+        agent = Agent(
+            task=TASK_TEMPLATE.format(phrase=entry["phrase"], region=entry["region"], target=self.per_task),
+            llm=ChatGoogleGenerativeAI(model=LLM_MODEL, temperature=0.0),
+            browser_profile=profile,
+        )
+        try:
+            result = await agent.run(max_steps=self.max_steps, on_step_end=on_step_end)
+            content = result.extracted_content()
+            entry["prospects"] += self._record(tid, parse_prospects(content))
+            with open(os.path.join(self.out_dir, "raw", f"{tid}.json"), "w", encoding="utf-8") as f:
+                json.dump(content, f, ensure_ascii=False, indent=2)
+            entry["status"], entry["error"] = "done", None
+        except Exception as e:
+            entry["status"], entry["error"] = "failed", str(e)
+            print(f"Task {tid} ({entry['phrase']!r}, {entry['region']}) failed: {e}")
+        finally:
+            self._checkpoint()
+
+    async def run(self) -> dict:
+        queue = asyncio.Queue()
+        for tid, entry in self.state["tasks"].items():
+            if entry["status"] == "pending":
+                queue.put_nowait(tid)
+        print(f"{queue.qsize()} tasks to run with {self.agents} agents, {len(self.seen)} prospects already collected")
+
+        async def worker(slot):
+            profile = await self._worker_profile(slot)
+            while not queue.empty():
+                tid = queue.get_nowait()
+                await self._run_task(tid, self.state["tasks"][tid], profile)
+
+        started = time.perf_counter()
+        self._prospects_file = open(self.prospects_path, "a", encoding="utf-8")
+        try:
+            await asyncio.gather(*(worker(slot) for slot in range(min(self.agents, queue.qsize()))))
+        finally:
+            self._prospects_file.close()
+            self._checkpoint()
+
+        statuses = [entry["status"] for entry in self.state["tasks"].values()]
+        return {
+            "tasks": len(statuses),
+            "done": statuses.count("done"),
+            "failed": statuses.count("failed"),
+            "prospects": len(self.seen),
+            "seconds": round(time.perf_counter() - started, 1),
+        }
+
+
+def _read_list(value):
+    """A comma-separated list, or @file / an existing path with one entry per line"""
+    path = value[1:] if value.startswith("@") else value
+    if os.path.isfile(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip()]
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--phrases", help="search phrases: a file with one per line, or comma-separated")
+    parser.add_argument("--regions", default="India", help="regions: a file with one per line, or comma-separated")
+    parser.add_argument("--agents", type=int, default=int(os.getenv("PROSPECT_AGENTS", "2")),
+                        help="browser agents running at once")
+    parser.add_argument("--per-task", type=int, default=10, help="prospects each agent is asked to collect")
+    parser.add_argument("--max-steps", type=int, default=60, help="step budget per agent")
+    parser.add_argument("--out", default=os.path.join("runs", "latest"))
+    parser.add_argument("--retry-failed", action="store_true")
+    args = parser.parse_args()
+
+    phrases = _read_list(args.phrases) if args.phrases else DEFAULT_PHRASES
+    tasks = [(phrase, region) for phrase in phrases for region in _read_list(args.regions)]
+    runner = ProspectRunner(args.out, tasks, agents=args.agents, per_task=args.per_task,
+                            max_steps=args.max_steps, retry_failed=args.retry_failed)
+    print(json.dumps(asyncio.run(runner.run()), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import os
+import threading
+import time
+
+from dotenv import load_dotenv
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+# Load environment variables from the .env file
+load_dotenv()
+
+# --- Database Connection Setup ---
+DB_USER = os.getenv("DB_USER")
+DB_PASSWORD = os.getenv("DB_PASSWORD")
+DB_HOST = os.getenv("DB_HOST")
+DB_PORT = os.getenv("DB_PORT")
+DB_NAME = os.getenv("DB_NAME")
+
+# DATABASE_URL overrides the DB_* settings, e.g. sqlite+aiosqlite:///./leads.db for a local stand-in
+DATABASE_URL = os.getenv("DATABASE_URL") or f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+
+# SQLite's only schema is "main"
+DB_SCHEMA = os.getenv("DB_SCHEMA") or ("main" if IS_SQLITE else "public")
+
+# --- Pool configuration ---
+POOL_SETTINGS = {
+    # Connections kept open, and extra ones allowed during bursts
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+    # Seconds a request waits for a free connection before failing
+    "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "10")),
+    # Connections older than this many seconds are replaced, ahead of server/proxy idle timeouts
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    # Test each connection on checkout so a database restart does not surface as request errors
+    "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "1") != "0",
+}
+# asyncpg prepares every statement and caches it per connection; the lead queries are built
+# from a small fixed set of SQL strings, so they are prepared once per connection and reused.
+STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100"))
+
+
+def _engine_options():
+    if IS_SQLITE:
+        # aiosqlite runs one connection per thread; the queue pool settings do not apply
+        return {}
+    return {**POOL_SETTINGS, "connect_args": {"prepared_statement_cache_size": STATEMENT_CACHE_SIZE}}
+
+
+# Create the async SQLAlchemy engine
+engine = create_async_engine(DATABASE_URL, **_engine_options())
+
+# Create a session-making class
+AsyncSessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+
+class PoolMetrics:
+    """Counts connection opens and checkouts and how long each connection was held"""
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self._held = []
+        self._window = window
+        self.connects = 0
+        self.checkouts = 0
+        self.invalidated = 0
+
+    def on_connect(self, *_):
+        with self._lock:
+            self.connects += 1
+
+    def on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["checked_out_at"] = time.perf_counter()
+        with self._lock:
+            self.checkouts += 1
+
+    def on_checkin(self, dbapi_connection, connection_record):
+        started = connection_record.info.pop("checked_out_at", None)
+        if started is None:
+            return
+        with self._lock:
+            self._held.append(time.perf_counter() - started)
+            del self._held[:-self._window]
+
+    def on_invalidate(self, *_):
+        with self._lock:
+            self.invalidated += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            held = sorted(self._held)
+            counters = {"connects": self.connects, "checkouts": self.checkouts, "invalidated": self.invalidated}
+        return {
+            **counters,
+            "held_p50_seconds": round(held[len(held) // 2], 4) if held else None,
+            "held_p95_seconds": round(held[min(len(held) - 1, int(0.95 * len(held)))], 4) if held else None,
+        }
+
+
+pool_metrics = PoolMetrics()
+for _name in ("connect", "checkout", "checkin", "invalidate"):
+    event.listen(engine.sync_engine.pool, _name, getattr(pool_metrics, f"on_{_name}"))
+
+
+def pool_status() -> dict:
+    """Current pool occupancy next to its configured limits and the cumulative counters"""
+    pool = engine.sync_engine.pool
+    status = {"pool": type(pool).__name__}
+    if hasattr(pool, "checkedout"):
+        checked_out = pool.checkedout()
+        max_overflow = max(0, getattr(pool, "_max_overflow", 0))
+        capacity = pool.size() + max_overflow
+        status.update({
+            "size": pool.size(),
+            "max_overflow": max_overflow,
+            "checked_out": checked_out,
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "utilization": round(checked_out / capacity, 3) if capacity else None,
+        })
+    status.update(pool_metrics.snapshot())
+    return status
+
+
+# --- Dependency Injection for Database Session ---
+# This function creates and yields a database session for each request
+# and ensures it's closed afterward.
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
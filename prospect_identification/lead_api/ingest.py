@@ -0,0 +1,188 @@
+"""
+Bulk loading of browser-use prospects into the lead table.
+
+Accepts the `User` records written by browser-use-implementation/extract_data.py
+(name, job_title, company, location) as a JSON array or NDJSON, maps them to lead rows,
+drops duplicates within the input and against existing leads (same first name, last name
+and company, case-insensitive), and inserts the rest in batches.
+
+On PostgreSQL each batch is COPYed into a temporary staging table and moved into the lead
+table with one INSERT ... SELECT ... WHERE NOT EXISTS; other databases (SQLite) fall back to
+batched multi-row inserts with the same NOT EXISTS check.
+
+Usage (from lead_api/):
+    python ingest.py ../browser-use-implementation/prospects.json --lead-type new_job --source linkedin
+"""
+import argparse
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional
+
+from pydantic import BaseModel
+from sqlalchemy import text
+
+from db import DB_SCHEMA, IS_SQLITE, engine
+
+BATCH_SIZE = int(os.getenv("LEADS_INGEST_BATCH_SIZE", "5000"))
+DEFAULT_LEAD_TYPE = os.getenv("LEADS_INGEST_TYPE", "new_job")
+DEFAULT_SOURCE = os.getenv("LEADS_INGEST_SOURCE", "linkedin")
+
+INSERT_COLUMNS = [
+    "lead_first_name", "lead_last_name", "lead_company_name", "lead_official_title",
+    "lead_type", "lead_generation_timestamp", "lead_generation_source", "lead_status",
+    "lead_contact_number",
+]
+
+_NOT_EXISTS = f"""
+    NOT EXISTS (
+        SELECT 1 FROM {DB_SCHEMA}."lead" l
+        WHERE lower(l.lead_first_name) = lower(s.lead_first_name)
+          AND lower(l.lead_last_name) = lower(s.lead_last_name)
+          AND lower(l.lead_company_name) = lower(s.lead_company_name)
+    )
+"""
+
+
+class Prospect(BaseModel):
+    """One prospect as produced by extract_data.py (its `User` model)"""
+    name: str
+    job_title: str = ""
+    company: str = ""
+    location: Optional[str] = None
+
+
+def read_records(path: str) -> List[dict]:
+    """Reads a JSON array (prospects.json) or NDJSON file of prospect records"""
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read()
+    if content.lstrip().startswith("["):
+        return json.loads(content)
+    return [json.loads(line) for line in content.splitlines() if line.strip()]
+
+
+def prospect_to_lead(prospect: Prospect, lead_type: str, source: str, generated_at: datetime) -> dict:
+    first_name, _, last_name = " ".join(prospect.name.split()).partition(" ")
+    return {
+        "lead_first_name": first_name,
+        "lead_last_name": last_name,
+        "lead_company_name": prospect.company.strip(),
+        "lead_official_title": prospect.job_title.strip(),
+        "lead_type": lead_type,
+        "lead_generation_timestamp": generated_at,
+        "lead_generation_source": source,
+        "lead_status": "new",
+        # Prospects are found through posts, so no contact number is known yet
+        "lead_contact_number": "",
+    }
+
+
+def _dedupe_key(lead: dict):
+    return (lead["lead_first_name"].lower(), lead["lead_last_name"].lower(), lead["lead_company_name"].lower())
+
+
+async def _insert_with_copy(conn, rows: List[dict]) -> int:
+    """COPY into a staging table, then one set-based insert of the leads that do not exist yet"""
+    driver = (await conn.get_raw_connection()).driver_connection
+    # SQLAlchemy's asyncpg adapter only opens its transaction on the first statement it runs itself,
+    # so statements on the raw connection would autocommit one by one (and ON COMMIT DELETE ROWS
+    # would empty the staging table before the INSERT ... SELECT). Run them in one explicit transaction.
+    async with driver.transaction():
+        # Column types only, no lead_id default: staging rows must not consume the id sequence.
+        # The temp table lives as long as the pooled connection and is emptied on every commit.
+        await driver.execute(f"""
+            CREATE TEMP TABLE IF NOT EXISTS lead_staging ON COMMIT DELETE ROWS AS
+            SELECT {", ".join(INSERT_COLUMNS)} FROM {DB_SCHEMA}."lead" WITH NO DATA
+        """)
+        await driver.copy_records_to_table(
+            "lead_staging", records=[tuple(row[c] for c in INSERT_COLUMNS) for row in rows], columns=INSERT_COLUMNS,
+        )
+        status = await driver.execute(f"""
+            INSERT INTO {DB_SCHEMA}."lead" ({", ".join(INSERT_COLUMNS)})
+            SELECT {", ".join(INSERT_COLUMNS)} FROM lead_staging s
+            WHERE {_NOT_EXISTS}
+        """)
+    # asyncpg returns the command tag, e.g. "INSERT 0 1234"
+    return int(status.split()[-1])
+
+
+async def _insert_rows(conn, rows: List[dict]) -> int:
+    """Portable fallback: one executemany of INSERT ... SELECT ... WHERE NOT EXISTS"""
+    values = ", ".join(f":{c} AS {c}" for c in INSERT_COLUMNS)
+    statement = text(f"""
+        INSERT INTO {DB_SCHEMA}."lead" ({", ".join(INSERT_COLUMNS)})
+        SELECT {", ".join(INSERT_COLUMNS)} FROM (SELECT {values}) s
+        WHERE {_NOT_EXISTS}
+    """)
+    # The driver sums the rows affected across the executemany, so skipped duplicates count as 0
+    return (await conn.execute(statement, rows)).rowcount
+
+
+async def ingest_prospects(records: Iterable, lead_type: str = DEFAULT_LEAD_TYPE, source: str = DEFAULT_SOURCE,
+                           batch_size: int = BATCH_SIZE) -> dict:
+    """
+    Validates, maps, deduplicates and inserts prospect records; each batch commits on its own.
+
+    Returns:
+        dict: counts of received, invalid, duplicate-in-input, inserted and already-existing
+        records, with the elapsed time and inserted rows per second.
+    """
+    started = time.perf_counter()
+    # Naive UTC, which both timestamp and timestamptz columns accept
+    generated_at = datetime.now(timezone.utc).replace(tzinfo=None)
+    received, invalid, seen, rows = 0, 0, set(), []
+    for record in records:
+        received += 1
+        try:
+            prospect = record if isinstance(record, Prospect) else Prospect.model_validate(record)
+        except ValueError:
+            invalid += 1
+            continue
+        lead = prospect_to_lead(prospect, lead_type, source, generated_at)
+        if not lead["lead_first_name"]:
+            invalid += 1
+            continue
+        if _dedupe_key(lead) in seen:
+            continue
+        seen.add(_dedupe_key(lead))
+        rows.append(lead)
+
+    inserted = 0
+    insert = _insert_rows if IS_SQLITE else _insert_with_copy
+    for i in range(0, len(rows), batch_size):
+        async with engine.begin() as conn:
+            inserted += await insert(conn, rows[i:i + batch_size])
+
+    elapsed = time.perf_counter() - started
+    return {
+        "received": received,
+        "invalid": invalid,
+        "duplicates_in_input": received - invalid - len(rows),
+        "inserted": inserted,
+        "already_existing": len(rows) - inserted,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(len(rows) / elapsed, 1) if elapsed else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="prospects.json (JSON array) or an NDJSON file")
+    parser.add_argument("--lead-type", default=DEFAULT_LEAD_TYPE)
+    parser.add_argument("--source", default=DEFAULT_SOURCE)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+
+    async def run():
+        try:
+            return await ingest_prospects(read_records(args.path), args.lead_type, args.source, args.batch_size)
+        finally:
+            await engine.dispose()
+
+    print(json.dumps(asyncio.run(run()), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+
+class LeadSnapshotCache:
+    """
+    Serialized /leads/ pages keyed by request, validated by a cheap change marker.
+
+    The marker is the version in `lead_change_counter`, a one-row table that a statement trigger
+    on the lead table bumps on every insert, update, delete or truncate
+    (migrations/003_lead_change_counter.sql). Reading it costs the same however many leads there
+    are. Any change invalidates the snapshots of every filter. The ETag of a page is a hash of the
+    marker and the request, so:
+    - a poll whose If-None-Match still matches gets a 304 without the page query or serialization
+    - a poll without it is served the stored JSON body while the marker is unchanged
+
+    Without that migration the marker falls back to max(lead_id) of the filtered set. That is a
+    single descent of the matching (lead_status, ..., lead_id) index, and it only sees new leads.
+    `max_age` then bounds how long an edit or delete can go unseen. Markers are reused for
+    `check_interval` seconds, so a burst of polls costs one marker query.
+    """
+
+    def __init__(self, max_entries=256, check_interval=2.0, max_age=300.0):
+        self.max_entries = max_entries
+        self.check_interval = check_interval
+        self.max_age = max_age
+        self._pages = OrderedDict()
+        self._markers = {}
+        self._lock = threading.Lock()
+        # None until the first marker query finds out whether lead_change_counter exists
+        self._has_counter = None
+        self.hits = 0
+        self.not_modified = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_entries=int(os.getenv("LEADS_CACHE_SIZE", "256")),
+            check_interval=float(os.getenv("LEADS_CHANGE_CHECK_INTERVAL", "2")),
+            max_age=float(os.getenv("LEADS_CACHE_MAX_AGE", "300")),
+        )
+
+    async def change_marker(self, db, schema: str, conditions: tuple, params: dict) -> str:
+        marker_key = (conditions, tuple(sorted(params.items())))
+        now = time.monotonic()
+        with self._lock:
+            cached = self._markers.get(marker_key)
+        if cached and now - cached[1] < self.check_interval:
+            return cached[0]
+
+        marker = await self._read_marker(db, schema, conditions, params)
+        with self._lock:
+            self._markers[marker_key] = (marker, now)
+            if len(self._markers) > self.max_entries:
+                self._markers.pop(next(iter(self._markers)))
+        return marker
+
+    async def _read_marker(self, db, schema: str, conditions: tuple, params: dict) -> str:
+        if self._has_counter is not False:
+            try:
+                version = (await db.execute(text(f"SELECT version FROM {schema}.lead_change_counter;"))).scalar_one()
+                self._has_counter = True
+                return f"v{version}"
+            except DBAPIError:
+                if self._has_counter:
+                    raise
+                # The failed statement aborts the transaction on PostgreSQL; start a clean one
+                await db.rollback()
+                self._has_counter = False
+                print(f"Warning: {schema}.lead_change_counter not found (migrations/003_lead_change_counter.sql); "
+                      f"/leads/ snapshots will only notice new leads until they expire")
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        latest = (await db.execute(text(f"""
+            SELECT max(lead_id)
+            FROM {schema}."lead"
+            {where};
+        """), params)).scalar()
+        # Snapshots also expire after max_age, to pick up edits and deletes this marker cannot see
+        return f"{latest}/{int(time.time() // self.max_age) if self.max_age else 0}"
+
+    @staticmethod
+    def etag(marker: str, request_key) -> str:
+        digest = hashlib.sha256(repr((marker, request_key)).encode("utf-8")).hexdigest()[:32]
+        return f'W/"{digest}"'
+
+    def get(self, request_key, etag: str):
+        """The stored (body, headers) for this request if it was built at the same ETag"""
+        with self._lock:
+            entry = self._pages.get(request_key)
+            if entry is None or entry[0] != etag:
+                self.misses += 1
+                return None
+            self._pages.move_to_end(request_key)
+            self.hits += 1
+            return entry[1], entry[2]
+
+    def set(self, request_key, etag: str, body: bytes, headers: dict):
+        with self._lock:
+            self._pages[request_key] = (etag, body, headers)
+            self._pages.move_to_end(request_key)
+            while len(self._pages) > self.max_entries:
+                self._pages.popitem(last=False)
+
+    def record_not_modified(self):
+        with self._lock:
+            self.not_modified += 1
+
+    def invalidate(self):
+        """Drops every marker so the next poll re-checks the table, e.g. right after an ingest"""
+        with self._lock:
+            self._markers.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._pages),
+                "hits": self.hits,
+                "not_modified": self.not_modified,
+                "misses": self.misses,
+                "check_interval_seconds": self.check_interval,
+                "max_age_seconds": self.max_age,
+            }
@@ -1,31 +1,32 @@
+import csv
+import io
+import json
 import os
-from typing import List
-from dotenv import load_dotenv
+from functools import lru_cache
+from typing import List, Optional
 
-from fastapi import FastAPI, Depends, HTTPException
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker, Session
-from pydantic import BaseModel
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import BaseModel, TypeAdapter
 from datetime import datetime
 
-# Load environment variables from the .env file
-load_dotenv()
+from db import DB_SCHEMA, AsyncSessionLocal, engine, get_db, pool_status
+from ingest import DEFAULT_LEAD_TYPE, DEFAULT_SOURCE, ingest_prospects
+from lead_cache import LeadSnapshotCache
 
-# --- Database Connection Setup ---
-DB_USER = os.getenv("DB_USER")
-DB_PASSWORD = os.getenv("DB_PASSWORD")
-DB_HOST = os.getenv("DB_HOST")
-DB_PORT = os.getenv("DB_PORT")
-DB_NAME = os.getenv("DB_NAME")
-DB_SCHEMA = os.getenv("DB_SCHEMA")
+# Page size bounds for /leads/ once a caller paginates (sends `limit` or `cursor`)
+DEFAULT_PAGE_SIZE = int(os.getenv("LEADS_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = int(os.getenv("LEADS_MAX_PAGE_SIZE", "1000"))
+# Rows fetched from the server-side cursor, and written to the client, per chunk of /leads/export
+EXPORT_BATCH_SIZE = int(os.getenv("LEADS_EXPORT_BATCH_SIZE", "2000"))
 
-DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-
-# Create the SQLAlchemy engine
-engine = create_engine(DATABASE_URL)
-
-# Create a session-making class
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+LEAD_COLUMNS = """
+    lead_id, lead_first_name, lead_last_name, lead_company_name,
+    lead_official_title, lead_type, lead_generation_timestamp,
+    lead_generation_source, lead_status, lead_contact_number
+"""
 
 # --- Pydantic Model for API Response ---
 # This model defines the shape of the data you'll send back.
@@ -46,15 +47,10 @@ class Lead(BaseModel):
         from_attributes = True  # Used to be orm_mode=True in Pydantic v1
 
 
-# --- Dependency Injection for Database Session ---
-# This function creates and yields a database session for each request
-# and ensures it's closed afterward.
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+LEAD_LIST = TypeAdapter(List[Lead])
+
+# Serialized /leads/ pages, revalidated against a change marker of the lead table
+snapshot_cache = LeadSnapshotCache.from_env()
 
 
 # --- FastAPI Application ---
@@ -65,30 +61,225 @@ app = FastAPI(
 )
 
 
+@app.on_event("shutdown")
+async def close_pool():
+    await engine.dispose()
+
+
+def lead_filters(status: Optional[str] = "new", lead_type: Optional[str] = None, source: Optional[str] = None,
+                 generated_after: Optional[datetime] = None, generated_before: Optional[datetime] = None):
+    """
+    Builds the WHERE clause and bind parameters shared by the lead queries.
+    Every value is a bound parameter; only the fixed column names are formatted into the SQL.
+    """
+    conditions, params = [], {}
+    for column, name, value, operator in (
+        ("lead_status", "status_filter", status, "="),
+        ("lead_type", "type_filter", lead_type, "="),
+        ("lead_generation_source", "source_filter", source, "="),
+        ("lead_generation_timestamp", "generated_after", generated_after, ">="),
+        ("lead_generation_timestamp", "generated_before", generated_before, "<"),
+    ):
+        if value is not None:
+            conditions.append(f"{column} {operator} :{name}")
+            params[name] = value
+    return conditions, params
+
+
+@lru_cache(maxsize=64)
+def lead_page_query(conditions: tuple, paged: bool = True):
+    """
+    One text() object per filter combination. Reusing it keeps SQLAlchemy's compiled cache warm and
+    sends byte-identical SQL, so asyncpg's per-connection prepared statement is reused on every page.
+    Without `paged` every matching lead is returned.
+    """
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    limit = "LIMIT :page_limit" if paged else ""
+    # Construct the SQL query using the schema from your .env file
+    # Using text() from SQLAlchemy helps prevent SQL injection vulnerabilities
+    return text(f"""
+        SELECT {LEAD_COLUMNS}
+        FROM {DB_SCHEMA}."lead"
+        {where}
+        ORDER BY lead_id
+        {limit};
+    """)
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    return if_none_match.strip() == "*" or etag in (tag.strip() for tag in if_none_match.split(","))
+
+
 @app.get("/leads/", response_model=List[Lead])
-def get_all_leads(db: Session = Depends(get_db)):
+async def get_all_leads(
+    request: Request,
+    cursor: Optional[int] = Query(None, description="lead_id of the last lead on the previous page (the X-Next-Cursor header)"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE,
+                                 description=f"page size (default {DEFAULT_PAGE_SIZE} once paginating)"),
+    status: Optional[str] = "new",
+    lead_type: Optional[str] = None,
+    source: Optional[str] = None,
+    generated_after: Optional[datetime] = None,
+    generated_before: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_db),
+):
     """
-    Retrieve all leads from the database.
-    
-    This endpoint queries the hackathon.lead table and returns a list of all entries.
+    Retrieve leads ordered by lead_id: all of them, or one page when `limit` or `cursor` is sent.
+
+    Filters on status (default "new"; pass `status=` to list every status), type, source and a
+    generation timestamp range [generated_after, generated_before). A request without `limit`
+    and `cursor` gets every matching lead, as this endpoint always returned. Pagination is
+    keyset-based: when more leads follow, the `X-Next-Cursor` response header holds the value to
+    pass as `cursor` for the next page, so every page is an index range scan of at most `limit`
+    rows, however deep it is.
+
+    Responses carry an ETag derived from a change marker of the filtered lead set. Pollers that
+    send it back in If-None-Match get a 304 while nothing changed; otherwise an unchanged page
+    is served from the snapshot cache without re-querying or re-serializing it.
     """
+    paged = limit is not None or cursor is not None
+    limit = (limit or DEFAULT_PAGE_SIZE) if paged else None
     try:
-        # Construct the SQL query using the schema from your .env file
-        # Using text() from SQLAlchemy helps prevent SQL injection vulnerabilities
-        query = text(f"""
-            SELECT 
-                lead_id, lead_first_name, lead_last_name, lead_company_name, 
-                lead_official_title, lead_type, lead_generation_timestamp, 
-                lead_generation_source, lead_status, lead_contact_number
-            FROM {DB_SCHEMA}."lead"
-            WHERE lead_status = :status_filter
-            ORDER BY lead_id;
-        """)
-
-        result = db.execute(query, {"status_filter": "new"}).fetchall()
-        
-        # FastAPI will automatically convert the database rows to match the `Lead` Pydantic model
-        return result
+        conditions, params = lead_filters(status or None, lead_type, source, generated_after, generated_before)
+        marker = await snapshot_cache.change_marker(db, DB_SCHEMA, tuple(conditions), params)
+        request_key = (tuple(conditions), tuple(sorted(params.items())), cursor, limit)
+        etag = snapshot_cache.etag(marker, request_key)
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            snapshot_cache.record_not_modified()
+            return Response(status_code=304, headers=headers)
+
+        cached = snapshot_cache.get(request_key, etag)
+        if cached:
+            body, page_headers = cached
+            return Response(content=body, media_type="application/json", headers={**headers, **page_headers})
+
+        if cursor is not None:
+            conditions.append("lead_id > :cursor")
+            params["cursor"] = cursor
+        if paged:
+            # One extra row tells us whether another page follows without a COUNT(*)
+            params["page_limit"] = limit + 1
+        result = (await db.execute(lead_page_query(tuple(conditions), paged), params)).fetchall()
+        page_headers = {}
+        if paged and len(result) > limit:
+            result = result[:limit]
+            page_headers["X-Next-Cursor"] = str(result[-1].lead_id)
+
+        # Rows are validated against the `Lead` model once and the JSON is kept for later polls
+        body = LEAD_LIST.dump_json(LEAD_LIST.validate_python(result, from_attributes=True))
+        snapshot_cache.set(request_key, etag, body, page_headers)
+        return Response(content=body, media_type="application/json", headers={**headers, **page_headers})
     except Exception as e:
         # Raise an HTTP exception if something goes wrong with the database query
-        raise HTTPException(status_code=500, detail=f"Database query failed: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Database query failed: {str(e)}")
+
+
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "leads.ndjson"),
+    "csv": ("text/csv", "leads.csv"),
+}
+
+
+async def _iter_export(query, params, export_format: str):
+    """
+    Streams rows off a server-side cursor and yields them one encoded batch at a time.
+
+    The session is owned by the generator (not get_db) so it stays open exactly as long as
+    the response body is being written, however long the export takes.
+    """
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(query, params, execution_options={"yield_per": EXPORT_BATCH_SIZE})
+        columns = list(result.keys())
+        buffer = io.StringIO()
+        writer = csv.writer(buffer) if export_format == "csv" else None
+        if writer:
+            writer.writerow(columns)
+        async for rows in result.partitions():
+            if writer:
+                writer.writerows(rows)
+            else:
+                for row in rows:
+                    buffer.write(json.dumps(dict(zip(columns, row)), default=str))
+                    buffer.write("\n")
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            # Only the CSV header, when no lead matched
+            yield buffer.getvalue()
+
+
+@app.get("/leads/export")
+async def export_leads(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    status: Optional[str] = "new",
+    lead_type: Optional[str] = None,
+    source: Optional[str] = None,
+    generated_after: Optional[datetime] = None,
+    generated_before: Optional[datetime] = None,
+):
+    """
+    Export every lead matching the filters as NDJSON (one lead per line) or CSV, ordered by lead_id.
+
+    Rows are read through a server-side cursor in batches of LEADS_EXPORT_BATCH_SIZE and written
+    as they arrive, so memory stays flat regardless of table size and the first bytes go out
+    as soon as the first batch is fetched. Pass `status=` (empty) to export every status.
+    """
+    conditions, params = lead_filters(status or None, lead_type, source, generated_after, generated_before)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    query = text(f"""
+        SELECT {LEAD_COLUMNS}
+        FROM {DB_SCHEMA}."lead"
+        {where}
+        ORDER BY lead_id;
+    """)
+    media_type, filename = EXPORT_FORMATS[format]
+    return StreamingResponse(
+        _iter_export(query, params, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@app.post("/leads/ingest")
+async def ingest_leads(request: Request, lead_type: str = DEFAULT_LEAD_TYPE, source: str = DEFAULT_SOURCE):
+    """
+    Bulk-load prospects from the browser-use pipeline as new leads.
+
+    The body is a JSON array of `User` records ({name, job_title, company, location}) as written
+    to prospects.json, or NDJSON with Content-Type application/x-ndjson. Prospects that match an
+    existing lead (first name, last name and company) are skipped. Returns the ingest counts
+    and rows per second.
+    """
+    body = await request.body()
+    try:
+        if "ndjson" in request.headers.get("content-type", ""):
+            records = [json.loads(line) for line in body.splitlines() if line.strip()]
+        else:
+            records = json.loads(body)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON body: {e}")
+    if not isinstance(records, list):
+        raise HTTPException(status_code=422, detail="Expected a JSON array of prospects")
+    try:
+        report = await ingest_prospects(records, lead_type, source)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Lead ingestion failed: {str(e)}")
+    # New rows change the lead set; make the next poll re-check instead of waiting for the interval
+    snapshot_cache.invalidate()
+    return report
+
+
+@app.get("/metrics/pool")
+async def get_pool_metrics():
+    """Connection pool occupancy, configured limits, and connect/checkout counters"""
+    return pool_status()
+
+
+@app.get("/metrics/cache")
+async def get_cache_metrics():
+    """Snapshot cache hits, 304 responses and misses for /leads/"""
+    return snapshot_cache.stats()
@@ -0,0 +1,22 @@
+-- Indexes backing keyset pagination and filters on GET /leads/.
+-- Replace "hackathon" with your DB_SCHEMA if it differs.
+-- CONCURRENTLY avoids locking the table for writes; run each statement outside a transaction, e.g.
+--   psql "$DATABASE_URL" -f migrations/001_lead_keyset_indexes.sql
+
+-- Default listing: WHERE lead_status = 'new' AND lead_id > :cursor ORDER BY lead_id LIMIT n
+CREATE INDEX CONCURRENTLY IF NOT EXISTS lead_status_lead_id_idx
+    ON hackathon."lead" (lead_status, lead_id);
+
+-- Status + type / status + source filters keep the same lead_id order inside each group
+CREATE INDEX CONCURRENTLY IF NOT EXISTS lead_status_type_lead_id_idx
+    ON hackathon."lead" (lead_status, lead_type, lead_id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS lead_status_source_lead_id_idx
+    ON hackathon."lead" (lead_status, lead_generation_source, lead_id);
+
+-- Timestamp range filters. Leads are appended in generation order, so a BRIN index stays tiny
+-- and lets range scans skip most of the table.
+CREATE INDEX CONCURRENTLY IF NOT EXISTS lead_generation_timestamp_brin
+    ON hackathon."lead" USING brin (lead_generation_timestamp);
+
+ANALYZE hackathon."lead";
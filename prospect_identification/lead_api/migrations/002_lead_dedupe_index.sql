@@ -0,0 +1,7 @@
+-- Supports the duplicate check of bulk ingestion (POST /leads/ingest, ingest.py), which matches
+-- prospects to existing leads by first name, last name and company, case-insensitively.
+-- Replace "hackathon" with your DB_SCHEMA if it differs. Run outside a transaction, e.g.
+--   psql "$DATABASE_URL" -f migrations/002_lead_dedupe_index.sql
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS lead_person_company_idx
+    ON hackathon."lead" (lower(lead_first_name), lower(lead_last_name), lower(lead_company_name));
@@ -0,0 +1,24 @@
+-- Change counter behind the ETags of GET /leads/ (lead_cache.py). Every statement that inserts,
+-- updates, deletes or truncates leads bumps it inside its own transaction, so the API can tell
+-- whether anything changed by reading one row instead of aggregating over the lead table.
+-- Replace "hackathon" with your DB_SCHEMA if it differs, e.g.
+--   psql "$DATABASE_URL" -f migrations/003_lead_change_counter.sql
+
+CREATE TABLE IF NOT EXISTS hackathon.lead_change_counter (
+    id boolean PRIMARY KEY DEFAULT true CHECK (id),
+    version bigint NOT NULL
+);
+INSERT INTO hackathon.lead_change_counter (version) VALUES (0) ON CONFLICT DO NOTHING;
+
+CREATE OR REPLACE FUNCTION hackathon.bump_lead_change_counter() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE hackathon.lead_change_counter SET version = version + 1;
+    RETURN NULL;
+END $$;
+
+-- Per statement, not per row, so a bulk ingest bumps the counter once
+DROP TRIGGER IF EXISTS lead_change_counter_bump ON hackathon."lead";
+CREATE TRIGGER lead_change_counter_bump
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON hackathon."lead"
+    FOR EACH STATEMENT EXECUTE FUNCTION hackathon.bump_lead_change_counter();